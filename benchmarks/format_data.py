@@ -0,0 +1,99 @@
+"""Time format_data() per 10k rows against the old row-looping version.
+
+Run from the repository root:
+
+    python -m benchmarks.format_data --rows 10000
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from flask_app.controllers.general_controller import format_data
+
+MONEY_ANSWERS = [
+    'i have no idea $80?', '50', 'Sports posters $10', 'posters $2 paint $3',
+    '12.50', 'about $120 and 30.5', None, 'N/A'
+]
+NAMES = ['jessalyn nguyen', 'Jaqueline Rodriguez ', 'krystal alexander', 'Tommy Owens']
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Date': ['Aug 23 24 04:52:50 PM'] * rows,
+        'Email Address': rng.choice(['a@example.com ', 'b@example.com', None], rows),
+        'Full Name': rng.choice(NAMES, rows),
+        'Instructor Provided Total': rng.choice(MONEY_ANSWERS, rows),
+        'Work Meetings': rng.integers(0, 5, rows).astype(float),
+        'Side Projects': rng.choice(MONEY_ANSWERS, rows),
+        'Invoices/Receipts': rng.choice(MONEY_ANSWERS, rows),
+    })
+
+
+def legacy_extract_and_sum_numbers(text):
+    numbers = re.findall(r'\d+\.?\d*', text)
+    numbers = map(float, numbers)
+    return sum(numbers)
+
+
+def legacy_format_data(df):
+    # format_data() as it was before the column-spec pipeline
+    df = df.apply(lambda col: col.str.strip() if col.dtype == "string" else col)
+    df = df.fillna('0')
+
+    working_columns = df.get(['Instructor Provided Total', 'Side Projects', 'Invoices/Receipts'])
+    working_columns = working_columns.map(lambda x: legacy_extract_and_sum_numbers(x))
+
+    df['Instructor Provided Total'] = working_columns['Instructor Provided Total']
+    df['Side Projects'] = working_columns['Side Projects']
+    df['Invoices/Receipts'] = working_columns['Invoices/Receipts']
+
+    for index in range(len(df)):
+        df['Full Name'] = df['Full Name'].astype('string')
+        df['Email Address'] = df['Email Address'].astype('string')
+
+        df['Full Name'] = df['Full Name'].str.title()
+
+        df['Full Name'] = df['Full Name'].str.strip()
+        df['Email Address'] = df['Email Address'].str.strip()
+
+    return df
+
+
+def best_of(fn, df, repeat):
+    times = []
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        fn(frame)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true', help="the old version is O(n^2), skip it for big runs")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    per_10k = 10000 / args.rows
+
+    new = best_of(format_data, df, args.repeat)
+    print(f"format_data         {new * per_10k * 1000:10.1f} ms per 10k rows")
+
+    if not args.skip_legacy:
+        pd.testing.assert_frame_equal(
+            format_data(df.copy()), legacy_format_data(df.copy()), check_dtype=False
+        )
+        old = best_of(legacy_format_data, df, 1)
+        print(f"legacy format_data  {old * per_10k * 1000:10.1f} ms per 10k rows")
+        print(f"speedup             {old / new:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Write a synthetic Google Form export for benchmarks.
+
+Run from the repository root:
+
+    python -m benchmarks.generate --rows 100000 -o form_100k.xlsx
+"""
+import argparse
+import datetime
+
+import numpy as np
+from openpyxl import Workbook
+
+from flask_app.utils.rates import DEFAULT_RATES_FILE, RateTable
+from flask_app.utils.schema import COLUMN_RENAMES
+
+# Headers exactly as the form exports them, in the form's order
+HEADERS = [
+    'Timestamp',
+    'Email Address',
+    'Full Name',
+    'Total $$ for the month',
+    'How many work meetings did you attend?',
+    'How many administrative meetings did you attend?',
+    'Did you work on any side projects?',
+    'Any invoices/receipts?'
+] + [question for question in COLUMN_RENAMES if question.startswith('How many classes')]
+
+# The kind of thing people actually type into the money questions
+MONEY_ANSWERS = [
+    '1250', '$1,250', '1250.00', 'i have no idea $80?', 'about $120 and 30.5',
+    'Sports posters $10', 'posters $2 paint $3', '12.50', 'N/A', 'none', '', None
+]
+CLASS_ANSWERS = [None, None, None, 0, 1, 2, 3, 4, '2', ' 1 ']
+
+
+def name_variants(name, rng):
+    # Stray spaces and odd capitalization, the way names come off the form
+    variant = rng.integers(0, 4)
+    if variant == 1:
+        return name.lower()
+    if variant == 2:
+        return f"{name} "
+    if variant == 3:
+        return f" {name.upper()}"
+    return name
+
+
+def generate_rows(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    names = list(RateTable.load(DEFAULT_RATES_FILE).names) + ['Unknown Instructor']
+    start = datetime.datetime(2024, 1, 1, 8, 0, 0)
+
+    offsets = np.sort(rng.integers(0, 365 * 24 * 60 * 60, rows))
+    people = rng.integers(0, len(names), rows)
+    money = rng.integers(0, len(MONEY_ANSWERS), (rows, 3))
+    meetings = rng.integers(0, 6, (rows, 2))
+    classes = rng.integers(0, len(CLASS_ANSWERS), (rows, len(HEADERS) - 8))
+
+    for i in range(rows):
+        name = names[people[i]]
+        yield [
+            start + datetime.timedelta(seconds=int(offsets[i])),
+            f"{name.lower().replace(' ', '.').replace(chr(39), '')}@example.com",
+            name_variants(name, rng),
+            MONEY_ANSWERS[money[i, 0]],
+            int(meetings[i, 0]),
+            int(meetings[i, 1]) or None,
+            MONEY_ANSWERS[money[i, 1]],
+            MONEY_ANSWERS[money[i, 2]],
+        ] + [CLASS_ANSWERS[answer] for answer in classes[i]]
+
+
+def write_workbook(path, rows, seed=0):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Form Responses 1')
+    sheet.append(HEADERS)
+    for row in generate_rows(rows, seed):
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args()
+
+    write_workbook(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
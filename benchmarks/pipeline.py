@@ -0,0 +1,184 @@
+"""Time each stage of the upload pipeline on synthetic workbooks.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline --rows 100 1000 10000
+    python -m benchmarks.pipeline --rows 100 1000 10000 --save-baseline
+
+Results are written as JSON. With a baseline file present, any stage that
+got slower than the tolerance allows is flagged and the exit code is 1.
+Timings only compare on the same machine, so the baseline is kept locally
+(benchmarks/baseline.json is not checked in): save one before a change,
+then run again after it.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import pandas as pd
+
+# Timing wrappers would show up in the numbers being measured
+os.environ.setdefault('METRICS_ENABLED', 'false')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+from benchmarks.generate import write_workbook
+from flask_app import create_app
+from flask_app.controllers.general_controller import (
+    calculate_total, convert_to_number, format_currency, format_data,
+    insert_calculated_columns, prepare_upload, read_excel, refresh, render_results
+)
+from flask_app.utils.class_totals import add_class_totals
+from flask_app.utils.compact import INVOICE_SCHEMA
+from flask_app.utils.excel_export import write_invoices
+from flask_app.utils.schema import CURRENCY_COLUMNS
+
+# Machine specific, see the module docstring
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'flask_excel_benchmarks')
+
+
+def workbook_bytes(rows, seed):
+    # Generating a big workbook takes longer than reading it, so keep them
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"form_{rows}_{seed}.xlsx")
+    if not os.path.exists(path):
+        write_workbook(path, rows, seed)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def best_of(fn, make_input, repeat):
+    # Fresh input for every run, since most stages change the frame in place
+    times = []
+    for _ in range(repeat):
+        value = make_input()
+        start = time.perf_counter()
+        fn(value)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def format_all_currency(df):
+    for col in CURRENCY_COLUMNS:
+        if col in df.columns:
+            df[col].map(format_currency)
+
+
+def render_page(app, df):
+    with app.test_request_context('/results'):
+        render_results(df, '/results')
+
+
+def run_stages(app, rows, seed, repeat):
+    data = workbook_bytes(rows, seed)
+    legacy = app.config['LEGACY_CLASS_TOTALS']
+
+    with app.app_context():
+        raw = read_excel(BytesIO(data))
+        refreshed = refresh(raw.copy())
+        formatted = format_data(refreshed.copy())
+        prepared = prepare_upload(raw.copy())
+        # Results pages are rendered from the stored, compact dataset
+        stored = INVOICE_SCHEMA.compact(prepared.copy())
+        # calculate_total() runs on the frame as it is right before it
+        # in calculate_invoices()
+        before_total = convert_to_number(
+            add_class_totals(insert_calculated_columns(formatted.copy()), legacy_last_column=legacy)
+        )
+
+        return {
+            'read_excel': best_of(lambda b: read_excel(BytesIO(b)), lambda: data, repeat),
+            'refresh': best_of(refresh, raw.copy, repeat),
+            'format_data': best_of(format_data, refreshed.copy, repeat),
+            'addition': best_of(
+                lambda df: add_class_totals(df, legacy_last_column=legacy), prepared.copy, repeat
+            ),
+            'calculate_total': best_of(calculate_total, before_total.copy, repeat),
+            'format_currency': best_of(format_all_currency, lambda: prepared, repeat),
+            'download': best_of(lambda df: write_invoices(df, BytesIO()), lambda: prepared, repeat),
+            'render': best_of(lambda df: render_page(app, df), lambda: stored, repeat),
+        }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    # Stages slower than baseline * (1 + tolerance). Millisecond stages jump
+    # around by more than that, so the slowdown must also be over min_delta.
+    regressions = []
+    for rows, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(rows, {}).get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + tolerance) and seconds - before > min_delta:
+                regressions.append((rows, stage, before, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="write this run's results here as JSON")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument('--min-delta', type=float, default=0.02, help="smallest slowdown in seconds worth flagging")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    # Unknown names in the synthetic data would log a warning every run
+    logging.disable(logging.WARNING)
+
+    app = create_app()
+    results = {}
+    for rows in args.rows:
+        stages = run_stages(app, rows, args.seed, args.repeat)
+        results[str(rows)] = stages
+        print(f"{rows} rows")
+        for stage, seconds in stages.items():
+            print(f"  {stage:<16} {seconds * 1000:10.1f} ms")
+
+    report = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against, run with --save-baseline first")
+        return
+    with open(args.baseline) as f:
+        saved = json.load(f)
+    if (saved.get('python'), saved.get('machine')) != (report['python'], report['machine']):
+        print(f"The baseline is from Python {saved.get('python')} on {saved.get('machine')}, save a new one on this machine")
+        return
+    baseline = saved['results']
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    for rows, stage, before, after in regressions:
+        print(f"REGRESSION {stage} at {rows} rows: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+    if regressions:
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Time a cold start of the app and check it against an import budget.
+
+Run from the repository root:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --budget 1500
+
+Each run starts a fresh interpreter that imports server.py, the same as
+a gunicorn worker booting without --preload. The run fails (exit code 1)
+when the median import time is over --budget milliseconds, or when a
+module that should only load on first use was imported at startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Only needed by some requests or by the CLI, never to boot a worker
+DEFERRED_MODULES = [
+    'matplotlib',
+    'alembic',
+    'flask_migrate',
+    'flask_sqlalchemy',
+    'sqlalchemy.ext.asyncio',
+    'pymysql',
+    'openpyxl',
+    'xlsxwriter',
+    'pyarrow.parquet',
+    'pyarrow.dataset',
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_server(env):
+    # -X importtime writes one line per module to stderr:
+    # "import time: self [us] | cumulative | imported package"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import server'],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative) / 1000
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1500, help="median import time allowed, in ms")
+    parser.add_argument('--top', type=int, default=10, help="slowest top level imports to list")
+    args = parser.parse_args()
+
+    # The budget is for serving requests: no database, no warm-up
+    env = {key: value for key, value in os.environ.items() if key not in ('DATABASE_URL', 'DB_HOST', 'APP_WARM_UP')}
+    env.setdefault('SECRET_KEY', 'benchmark')
+
+    runs = [import_server(env) for _ in range(args.runs)]
+    totals = [modules['server'] for modules in runs]
+    median = statistics.median(totals)
+    print(f"import server  median {median:8.1f} ms  min {min(totals):8.1f} ms  max {max(totals):8.1f} ms")
+
+    # Cumulative times include everything a module imports in turn
+    last = runs[-1]
+    print("slowest imports (last run):")
+    for name, ms in sorted(last.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {name:<45} {ms:8.1f} ms")
+
+    failed = False
+    loaded = sorted(name for name in DEFERRED_MODULES if name in last)
+    if loaded:
+        failed = True
+        print(f"FAIL imported at startup: {', '.join(loaded)}")
+    if median > args.budget:
+        failed = True
+        print(f"FAIL median {median:.1f} ms is over the {args.budget:.0f} ms budget")
+    if failed:
+        sys.exit(1)
+    print("Within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,181 @@
 from flask import Flask, render_template
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_session import Session
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import click
+import gc
 import os
+import tempfile
 from dotenv import load_dotenv
-import pymysql
+from flask_app.utils.archive import InvoiceArchive
+from flask_app.utils.compression import Compression
+from flask_app.utils.dataset_store import DatasetStore, UploadCache
+from flask_app.utils.http_cache import ResponseCache
+from flask_app.utils.fetcher import SheetFetcher
+from flask_app.utils.jobs import JobQueue
+from flask_app.utils.metrics import Metrics
+from flask_app.utils.rates import DEFAULT_RATES_FILE, RateBook
 
 load_dotenv()  # Load environment variables
 
-db = SQLAlchemy()
+_db = None
+dataset_store = DatasetStore()
+upload_cache = UploadCache()
+sheet_fetcher = SheetFetcher()
+job_queue = JobQueue()
+metrics = Metrics()
+rate_book = RateBook()
+response_cache = ResponseCache()
+compression = Compression(cache=response_cache)
+invoice_archive = InvoiceArchive()
 
-def create_app():
+
+def get_db():
+    # SQLAlchemy takes a while to import, so it waits until something needs it
+    global _db
+    if _db is None:
+        from flask_sqlalchemy import SQLAlchemy
+        _db = SQLAlchemy()
+    return _db
+
+
+def __getattr__(name):
+    # Keeps `from flask_app import db` working
+    if name == 'db':
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up(app):
+    # With gunicorn --preload this runs once in the master. Everything loaded
+    # here (modules, rate tables, compiled templates) is shared with the
+    # workers copy-on-write instead of being loaded again by each of them.
+    import openpyxl
+    import pyarrow.dataset
+    import pyarrow.parquet
+    import xlsxwriter
+    if app.config['DATABASE_ENABLED']:
+        from flask_app.models import invoice
+    for template in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template)
+
+    # Objects that survive the collector's generations would otherwise be
+    # written to by it in every worker, copying the shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def create_app(config=None):
     app = Flask(__name__, static_folder='static', template_folder='templates')
 
     # Configure the SQLAlchemy part of the app
     db_url = f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+    # DATABASE_URL points at a stand-in database, e.g. sqlite:///invoices.db
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', db_url)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('mysql'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 280)),
+            'pool_pre_ping': True
+        }
+    # Routes that don't touch the database shouldn't pay for it
+    app.config['DATABASE_ENABLED'] = bool(os.getenv('DATABASE_URL') or os.getenv('DB_HOST'))
+    # Processed uploads are saved to the invoices table in the background
+    persist_default = 'true' if app.config['DATABASE_ENABLED'] else 'false'
+    app.config['PERSIST_INVOICES'] = os.getenv('PERSIST_INVOICES', persist_default).lower() == 'true'
+    app.config['INVOICE_BATCH_SIZE'] = int(os.getenv('INVOICE_BATCH_SIZE', 1000))
+    # Every processed upload is also kept in a Parquet archive, one partition per month
+    app.config['ARCHIVE_INVOICES'] = os.getenv('ARCHIVE_INVOICES', 'true').lower() == 'true'
+    app.config['ARCHIVE_DIR'] = os.getenv('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+    app.config['ARCHIVE_ROW_GROUP_SIZE'] = int(os.getenv('ARCHIVE_ROW_GROUP_SIZE', 64 * 1024))
     app.config['DEBUG'] = True
     app.config['SESSION_TYPE'] = 'filesystem'
+    # Keep the old class totals that leave out the last school column
+    app.config['LEGACY_CLASS_TOTALS'] = os.getenv('LEGACY_CLASS_TOTALS', 'true').lower() == 'true'
+    # Instructor rates, reloaded when the file changes
+    app.config['RATES_FILE'] = os.getenv('RATES_FILE', DEFAULT_RATES_FILE)
+    app.config['RATES_CHECK_INTERVAL'] = int(os.getenv('RATES_CHECK_INTERVAL', 10))
     app.secret_key = os.getenv('SECRET_KEY')
+    app.config['RESULTS_PAGE_SIZE'] = int(os.getenv('RESULTS_PAGE_SIZE', 100))
+    app.config['EXPORT_SPOOL_MAX_SIZE'] = int(os.getenv('EXPORT_SPOOL_MAX_SIZE', 8 * 1024 * 1024))
+
+    # Uploaded datasets are kept per session in a local file cache
+    app.config['DATASET_DIR'] = os.getenv('DATASET_DIR', os.path.join(tempfile.gettempdir(), 'flask_excel_datasets'))
+    app.config['DATASET_CACHE_MAX_BYTES'] = int(os.getenv('DATASET_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    app.config['DATASET_CACHE_MAX_ENTRIES'] = int(os.getenv('DATASET_CACHE_MAX_ENTRIES', 200))
+
+    # Parsed uploads are cached by a hash of the file contents
+    app.config['UPLOAD_DIR'] = os.getenv('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'flask_excel_uploads'))
+    app.config['UPLOAD_CACHE_MAX_BYTES'] = int(os.getenv('UPLOAD_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    app.config['UPLOAD_CACHE_MAX_ENTRIES'] = int(os.getenv('UPLOAD_CACHE_MAX_ENTRIES', 50))
+    app.config['UPLOAD_CACHE_TTL'] = int(os.getenv('UPLOAD_CACHE_TTL', 7 * 24 * 60 * 60))
+
+    # Uploads are written to disk as they arrive and processed in a pool of
+    # processes; once UPLOAD_QUEUE_SIZE are waiting or running, new ones get a 429.
+    # Both are per gunicorn worker: with 4 workers the server runs up to
+    # 4 * UPLOAD_WORKERS processes and takes 4 * UPLOAD_QUEUE_SIZE uploads.
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+    app.config['UPLOAD_SPOOL_DIR'] = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'flask_excel_spool'))
+    app.config['UPLOAD_WORKERS'] = int(os.getenv('UPLOAD_WORKERS', 2))
+    app.config['UPLOAD_QUEUE_SIZE'] = int(os.getenv('UPLOAD_QUEUE_SIZE', 4))
+
+    # Rendered results and exports, reused until the dataset or filters change
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    app.config['RESPONSE_CACHE_MAX_ENTRY_BYTES'] = int(os.getenv('RESPONSE_CACHE_MAX_ENTRY_BYTES', 8 * 1024 * 1024))
+    # HTML and JSON responses are sent brotli or gzip compressed
+    app.config['COMPRESS_ENABLED'] = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+    # Google Sheets imports run in the background
+    app.config['GOOGLE_SHEET_URL'] = os.getenv('GOOGLE_SHEET_URL', 'https://docs.google.com/spreadsheets/d/1-vVRybivqBrzzrXAfl5ikMP-7wJrOK5KO8lofohFwoc/edit?gid=1688582025')
+    app.config['SHEET_CACHE_DIR'] = os.getenv('SHEET_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'flask_excel_sheets'))
+    app.config['SHEET_FETCH_TIMEOUT'] = int(os.getenv('SHEET_FETCH_TIMEOUT', 30))
+    # Only responses newer than the last import are processed
+    app.config['SHEET_INCREMENTAL'] = os.getenv('SHEET_INCREMENTAL', 'true').lower() == 'true'
+    app.config['JOBS_DIR'] = os.getenv('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'flask_excel_jobs'))
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+    app.config['JOB_TTL'] = int(os.getenv('JOB_TTL', 24 * 60 * 60))
+
+    # Stage timings served on /metrics, optionally echoed in a Server-Timing header
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_SERVER_TIMING'] = os.getenv('METRICS_SERVER_TIMING', 'false').lower() == 'true'
+    app.config['METRICS_TRACK_MEMORY'] = os.getenv('METRICS_TRACK_MEMORY', 'false').lower() == 'true'
+
+    # Load everything up front, for gunicorn --preload (see gunicorn.conf.py)
+    app.config['WARM_UP'] = os.getenv('APP_WARM_UP', 'false').lower() == 'true'
+
+    # Settings that win over the environment, e.g. the config of the app
+    # that started an upload process
+    if config:
+        app.config.update(config)
     
-    # Initialize SQLAlchemy and Flask-Migrate
-    db.init_app(app)
-    migrate = Migrate(app, db)
+    # Initialize SQLAlchemy and Flask-Migrate. Alembic is only needed by the
+    # `flask db` commands, so it isn't loaded when serving requests.
+    from_cli = click.get_current_context(silent=True) is not None
+    if app.config['DATABASE_ENABLED'] or from_cli:
+        get_db().init_app(app)
+    if from_cli:
+        from flask_migrate import Migrate
+        from flask_app.models import invoice
+        Migrate(app, get_db())
     Session(app)
+    dataset_store.init_app(app)
+    upload_cache.init_app(app)
+    sheet_fetcher.init_app(app)
+    job_queue.init_app(app)
+    metrics.init_app(app)
+    rate_book.init_app(app)
+    response_cache.init_app(app)
+    compression.init_app(app)
+    invoice_archive.init_app(app)
+    metrics.add_cache('upload', upload_cache)
+    metrics.add_cache('response', response_cache)
     
     
     def get_session():
-        return db.session
+        return get_db().session
             
     app.get_session = get_session
     
@@ -39,6 +184,12 @@ def create_app():
     
     app.register_blueprint(general_bp)
 
+    from flask_app.commands import invoices_cli
+    app.cli.add_command(invoices_cli)
+
+    if app.config['WARM_UP']:
+        warm_up(app)
+
     return app
 
 def get_database_url():
@@ -0,0 +1,130 @@
+import glob
+import os
+import time
+
+import click
+import pandas as pd
+from flask.cli import AppGroup
+
+from flask_app.utils.exports import EXPORT_FORMATS
+
+invoices_cli = AppGroup('invoices', help='Process invoice workbooks without the web app.')
+
+# Set in each pool process by init_worker
+worker_app = None
+
+
+def init_worker():
+    global worker_app
+    from flask_app import create_app
+    worker_app = create_app()
+
+
+def find_workbooks(paths):
+    # Directories are searched for .xlsx files, anything else is a glob
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(glob.glob(os.path.join(path, '*.xlsx')))
+        else:
+            found.extend(glob.glob(path))
+    # Skip Excel's lock files
+    return sorted({path for path in found if not os.path.basename(path).startswith('~$')})
+
+
+def process_workbook(path, output_dir, export_format, keep_frame, archive):
+    from flask_app import invoice_archive
+    from flask_app.controllers.general_controller import prepare_upload, read_excel
+    from flask_app.utils.compact import INVOICE_SCHEMA
+
+    timings = {}
+    start = time.perf_counter()
+    with worker_app.app_context():
+        with open(path, 'rb') as f:
+            df = read_excel(f)
+        timings['read'] = time.perf_counter() - start
+
+        mark = time.perf_counter()
+        df = prepare_upload(df)
+        timings['process'] = time.perf_counter() - mark
+
+        if archive:
+            mark = time.perf_counter()
+            invoice_archive.add(INVOICE_SCHEMA.compact(df))
+            timings['archive'] = time.perf_counter() - mark
+
+    output = None
+    if output_dir:
+        mark = time.perf_counter()
+        writer, extension, _ = EXPORT_FORMATS[export_format]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output = os.path.join(output_dir, f"{stem}_processed.{extension}")
+        with open(output, 'wb') as f:
+            writer(df, f)
+        timings['export'] = time.perf_counter() - mark
+
+    timings['total'] = time.perf_counter() - start
+    return {
+        'path': path,
+        'output': output,
+        'rows': len(df),
+        'timings': timings,
+        'frame': df if keep_frame else None
+    }
+
+
+@invoices_cli.command('batch')
+@click.argument('paths', nargs=-1, required=True)
+@click.option('-o', '--output-dir', type=click.Path(file_okay=False), help='Write one processed file per workbook here.')
+@click.option('-c', '--combined', type=click.Path(dir_okay=False), help='Also write every workbook into this one file.')
+@click.option('-f', '--format', 'export_format', type=click.Choice(sorted(EXPORT_FORMATS)), default='xlsx', show_default=True)
+@click.option('-a', '--archive', is_flag=True, help='Also add every workbook to the invoice archive.')
+@click.option('-j', '--workers', type=int, default=os.cpu_count(), show_default=True, help='Processes to run at once.')
+def batch(paths, output_dir, combined, export_format, archive, workers):
+    """Run the upload pipeline over directories or globs of .xlsx files."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    workbooks = find_workbooks(paths)
+    if not workbooks:
+        raise click.ClickException('No .xlsx files found')
+    if not output_dir and not combined and not archive:
+        raise click.ClickException('Nothing to write, pass --output-dir, --combined and/or --archive')
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    workers = max(1, min(workers, len(workbooks)))
+    click.echo(f"Processing {len(workbooks)} workbooks with {workers} workers")
+
+    results = {}
+    failed = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = {
+            pool.submit(process_workbook, path, output_dir, export_format, bool(combined), archive): path
+            for path in workbooks
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append(path)
+                click.echo(f"[{done}/{len(workbooks)}] {path} failed: {e}", err=True)
+                continue
+            results[path] = result
+            steps = ' '.join(f"{step} {seconds:.2f}s" for step, seconds in result['timings'].items())
+            click.echo(f"[{done}/{len(workbooks)}] {path} {result['rows']} rows ({steps})")
+
+    if combined and results:
+        # Same order as the file list, not the order they finished in
+        frames = [results[path]['frame'] for path in workbooks if path in results]
+        writer, _, _ = EXPORT_FORMATS[export_format]
+        with open(combined, 'wb') as f:
+            writer(pd.concat(frames, ignore_index=True), f)
+        click.echo(f"Combined output written to {combined}")
+
+    elapsed = time.perf_counter() - start
+    rows = sum(result['rows'] for result in results.values())
+    click.echo(f"Done: {len(results)} workbooks, {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)")
+    if failed:
+        raise click.ClickException(f"{len(failed)} workbooks failed")
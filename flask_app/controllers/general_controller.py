@@ -1,62 +1,75 @@
-from flask import Flask, request, render_template, Blueprint, redirect, send_file
+from flask import Flask, request, render_template, Blueprint, redirect, send_file, current_app, session, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 import re
-import xlsxwriter
+import logging
+import hashlib
+import math
+import os
+import tempfile
 import pandas as pd
-import numpy as np
-import matplotlib as mpl
 from io import BytesIO
+from flask_app.utils.class_totals import add_class_totals
+from flask_app.utils.rates import apply_rates, WORK_MEETING_RATE, ADMIN_MEETING_RATE
+from flask_app.utils.ingest import read_workbook
+from flask_app.utils.normalize import normalize
+from flask_app.utils.schema import COLUMN_RENAMES, CURRENCY_COLUMNS
+from flask_app.utils.dataset_index import DATE_FORMAT, DatasetIndex
+from flask_app.utils.rollups import MonthlyRollups, month_labels
+from flask_app.utils.compact import INVOICE_SCHEMA
+from flask_app.utils.exports import EXPORT_FORMATS
+from flask_app.utils.results_table import cell_classes, highlight_flags, slice_frame, to_columns
+from flask_app.utils.jobs import QueueFull
+from flask_app.utils.archive import InvalidQuery
+from flask_app import dataset_store, upload_cache, job_queue, metrics, rate_book, response_cache, invoice_archive
+
+logger = logging.getLogger(__name__)
 
 # Create a Blueprint
 bp = Blueprint('general', __name__)
 
-df_global = None
+# Uploads are copied to disk this much at a time
+SPOOL_CHUNK_SIZE = 1024 * 1024
 
-def read_excel(file):
-    df = pd.read_excel(file, engine='openpyxl', dtype=str)
-    return df
+# Imported helpers are timed under their own names like the stages below
+add_class_totals = metrics.timed(add_class_totals)
 
 
-def convert_to_string(value):
-    try:
-        return str(value)
-    except Exception as e:
-        print(f"Error converting value: {value} - {e}")
-        return ''
+@metrics.timed
+def load_dataset():
+    key = session.get('dataset_id')
+    update_rates(dataset_store, key)
+    df = dataset_store.get(key)
+    if df is None:
+        return None
+    # Datasets stored before the compact layout still have text dates
+    return INVOICE_SCHEMA.compact(df)
 
 
-def filter_by_month(df, column_name, month):
-    df[column_name] = pd.to_datetime(df[column_name], format='%b %d %y %I:%M:%S %p')
-    return df[df[column_name].dt.month == month]
+def use_dataset(key):
+    old_key = session.get('dataset_id')
+    if old_key != key:
+        dataset_store.delete(old_key)
+    session['dataset_id'] = key
 
 
-def filter_by_column(df, column_name, value):
-    if column_name in df.columns:
-        return df[df[column_name].str.contains(value, case=False, na=False)]
+@metrics.timed
+def read_excel(file, since=None):
+    df = read_workbook(file, since=since)
     return df
 
 
-def addition(df, row_index):
-    # Ensure 'Total # of Classes' column exists
-    if 'Total # of Classes' not in df.columns:
-        df['Total # of Classes'] = 0
-    
-    # Get column indices to sum based on the position
-    start_col = 11  # Index of the first column to include in the sum
-
-    # Iterate over each row to calculate the total
-    total = 0
-    for col_index in range(start_col, len(df.columns)):
-        col_name = df.columns[col_index]
-        value = pd.to_numeric(df.iloc[row_index, col_index], errors='coerce')
-        df.at[row_index, 'Total # of Classes'] = total
-        
-        if pd.isna(value):
-            value = 0
-        total += value
+def filter_by_month(df, column_name, month):
+    dates = pd.to_datetime(df[column_name], format='%b %d %y %I:%M:%S %p')
+    return df[dates.dt.month == month]
 
+
+def filter_by_column(df, column_name, value):
+    if column_name in df.columns:
+        return df[df[column_name].str.contains(value, case=False, na=False)]
     return df
 
 
+@metrics.timed
 def convert_to_number(df):
     column_indices = [
         'Calculated Total Amount',
@@ -90,62 +103,19 @@ def convert_to_number(df):
 
 
 def rename_columns(df):
-    df = df.rename(columns={
-        "Timestamp": "Date",
-        "How many work meetings did you attend?": "Work Meetings",
-        "How many administrative meetings did you attend?": "Admin Meetings",
-        "Total $$ for the month": "Instructor Provided Total",
-        "Did you work on any side projects?": "Side Projects",
-        "Any invoices/receipts?": "Invoices/Receipts",
-        "How many classes did you teach this month? [Arroyo]": "Arroyo",
-        "How many classes did you teach this month? [Myford]": "Myford",
-        "How many classes did you teach this month? [Tustin Ranch]": "Tustin Ranch",
-        "How many classes did you teach this month? [Ladera]": "Ladera",
-        "How many classes did you teach this month? [Anaheim Hills]": "Anaheim Hills",
-        "How many classes did you teach this month? [Historic Anaheim]": "Historic Anaheim",
-        "How many classes did you teach this month? [North Tustin]": "North Tustin",
-        "How many classes did you teach this month? [San Juan Capistrano]": "San Juan Capistrano",
-        "How many classes did you teach this month? [Hicks Canyon]": "Hicks Canyon",
-        "How many classes did you teach this month? [Orchard Hills]": "Orchard Hills",
-        "How many classes did you teach this month? [Peters Canyon]": "Peters Canyon",
-        "How many classes did you teach this month? [TMA]": "TMA"
-        })
-    return df
-
-
-def format_currency(df):
-    currency_columns = ['Instructor Provided Total', 'Side Projects', 'Invoices/Receipts', 'Rate', 'OH Rate']
-    for col in currency_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            df[col] = df[col].replace('', '0.00').fillna('0.00').astype('float')
-            df[col] = df[col].apply(lambda x: f"${x:,.2f}")
-    
-    df['Calculated Total Amount'] = df['Calculated Total Amount'].apply(lambda x: f"${x:,.2f}")
-            
+    df = df.rename(columns=COLUMN_RENAMES)
     return df
 
 
-def extract_and_sum_numbers(text):
-    # Extract numbers and remove them from text
-    numbers = re.findall(r'\d+\.?\d*', text)
-    # Convert extracted numbers to floats and sum them
-    numbers = map(float, numbers)
-    return sum(numbers)
-
-
-def sum_and_format_numbers(df, column_name):
-    # Ensure the specified column exists in the DataFrame
-    if column_name in df.columns:
-        # Apply extraction and summing function to each row
-        df[column_name] = df[column_name].apply(lambda x: extract_and_sum_numbers(x) if pd.notna(x) else 0)
-        
-        # Convert the column to numeric
-        df[column_name] = pd.to_numeric(df[column_name], errors='coerce').fillna(0)
-    
-    return df
+@bp.app_template_filter('currency')
+def format_currency(value):
+    value = pd.to_numeric(value, errors='coerce')
+    if pd.isna(value):
+        value = 0
+    return f"${value:,.2f}"
 
 
+@metrics.timed
 def calculate_total(df):
     # Ensure 'Calculated Total Amount' column exists
     if 'Calculated Total Amount' not in df.columns:
@@ -167,11 +137,8 @@ def calculate_total(df):
     return df
 
 
+@metrics.timed
 def calculate_meetings(df):
-    # Define rates
-    work_meeting_rate = 20
-    admin_meeting_rate = 25
-    
     # Ensure 'Calculated Total Amount' column exists
     if 'Calculated Total Amount' not in df.columns:
         df['Calculated Total Amount'] = 0.0
@@ -181,10 +148,10 @@ def calculate_meetings(df):
     admin_meetings_income = pd.Series(0, index=df.index)
     
     if 'Work Meetings' in df.columns:
-        work_meetings_income = pd.to_numeric(df['Work Meetings'], errors='coerce').fillna(0) * work_meeting_rate
+        work_meetings_income = pd.to_numeric(df['Work Meetings'], errors='coerce').fillna(0) * WORK_MEETING_RATE
     
     if 'Admin Meetings' in df.columns:
-        admin_meetings_income = pd.to_numeric(df['Admin Meetings'], errors='coerce').fillna(0) * admin_meeting_rate
+        admin_meetings_income = pd.to_numeric(df['Admin Meetings'], errors='coerce').fillna(0) * ADMIN_MEETING_RATE
     
     # Sum income from work meetings and admin meetings
     df['Calculated Total Amount'] += work_meetings_income + admin_meetings_income
@@ -192,63 +159,12 @@ def calculate_meetings(df):
     return df
 
 
+@metrics.timed
 def input_rates(df):
-    rates = {
-        'Aldyn Richmond': 50,
-        'Alex Garber': 50,
-        'Alexis Lawrence': 50,
-        'Anamaria Najjar': 50,
-        'Andy Prendiville': 55,
-        'Andrew Prendiville': 55,
-        'Bailey Johnson': 65,
-        'Brian Kile': 65,
-        'Charity Norton': 50,
-        'Cory Camama': 60,
-        'Dominick Pallatto': 55,
-        'Gabriel Hernandez': 60,
-        'Gino DeFalco': 60,
-        'Jackie Rodriguez': 60,
-        'Jaqueline Rodriguez': 60,
-        'James Manley': 60,
-        "James O'Leary": 60,
-        'Jenny Dong': 55,
-        'Jessalyn Nguyen': 50,
-        'Keshawn Carter': 50,
-        'Kimberly Nguyen': 55,
-        'Kim Nguyen': 55,
-        'Krystal Alexander': 50,
-        'Layla Kurokawa': 60,
-        'Max Evans': 55,
-        'Michael Le': 50,
-        'Middka Vicencio': 60,
-        'Mike Ash': 70,
-        'Nnamdi Agude': 60,
-        'Sharon Aguilar': 55,
-        'Shyam Gandhi': 50,
-        'Tina Huynh': 60,
-        'Tommy Owens': 60,
-        'Zayaan Khan': 50
-    }
-    
-    oh_rates = {
-        'Jenny Dong': 75,
-        'Nnamdi Agude': 85,
-        'Tommy Owens': 90
-    }
-
-    for index in range(len(df)):
-        if index in df.index and 'Full Name' in df.columns:
-            full_name = df.loc[index, 'Full Name']
-        else:
-            continue
-        if full_name in rates:
-            df.at[index, 'Rate'] = rates[full_name]
-        if full_name in oh_rates:
-            df.at[index, 'OH Rate'] = oh_rates[full_name]
-    
-    return df
+    return apply_rates(df, rate_book.current())
 
 
+@metrics.timed
 def calculate_classes(df):
     df = input_rates(df)
     
@@ -266,31 +182,13 @@ def calculate_classes(df):
     return df
 
 
+@metrics.timed
 def format_data(df):
-    # df = df.convert_dtypes()
-    df = df.apply(lambda col: col.str.strip() if col.dtype == "string" else col)
-    df = df.fillna('0')
-    
-    working_columns = df.get(['Instructor Provided Total', 'Side Projects', 'Invoices/Receipts'])
-    working_columns = working_columns.map(lambda x: extract_and_sum_numbers(x))
-    
-    df['Instructor Provided Total'] = working_columns['Instructor Provided Total']
-    df['Side Projects'] = working_columns['Side Projects']
-    df['Invoices/Receipts'] = working_columns['Invoices/Receipts']
-    
-    for index in range(len(df)):     
-        df['Full Name'] = df['Full Name'].astype('string')
-        df['Email Address'] = df['Email Address'].astype('string')
-        
-        df['Full Name'] = df['Full Name'].str.title()
-        
-        df['Full Name'] = df['Full Name'].str.strip()
-        df['Email Address'] = df['Email Address'].str.strip()
-        
-    
+    df = normalize(df)
     return df
 
 
+@metrics.timed
 def refresh(df):
     if 'Timestamp' in df.columns:
         df['Timestamp'] = pd.to_datetime(df['Timestamp'])
@@ -321,183 +219,587 @@ def convert_google_sheet_url(url):
     return new_url
 
 
+@metrics.timed
+def prepare_upload(df):
+    # Everything derived is worked out here, once per upload, and stored
+    # with the dataset so filtering only has to pick rows
+    df = refresh(df)
+    df = format_data(df)
+    df = insert_calculated_columns(df)
+    df = calculate_invoices(df)
+
+    return df
+
+
+@metrics.timed
+def reprice(df):
+    # Work the rate dependent totals out again on a compact dataset, the
+    # same way prepare_upload() does from the inserted zero rates
+    df = INVOICE_SCHEMA.expand(df)
+    df['Rate'] = 0
+    df['OH Rate'] = 0
+    df['Calculated Total Amount'] = 0.0
+    df = calculate_total(df)
+    return INVOICE_SCHEMA.compact(df)
+
+
+def build_rollups(df):
+    # School pay follows the same class totals mode as the totals themselves
+    return MonthlyRollups.build(df, legacy_last_column=current_app.config['LEGACY_CLASS_TOTALS'])
+
+
+def update_rates(store, key):
+    # Datasets record the rate version their totals were worked out with and
+    # are repriced in place the first time they're used after the rates change
+    version = rate_book.version
+    if not store.contains(key) or store.get_metadata(key).get('rate_version') == version:
+        return
+    df = store.get(key)
+    if df is None:
+        return
+    df = reprice(INVOICE_SCHEMA.compact(df))
+    store.put(key, df, rollups=build_rollups(df), metadata={'rate_version': version})
+
+
+def insert_calculated_columns(df):
+    if 'Total # of Classes' not in df.columns:
+        df.insert(8, 'Total # of Classes', 0)
+    if 'Rate' not in df.columns:
+        df.insert(3, 'Rate', 0)
+    if 'OH Rate' not in df.columns:
+        df.insert(4, 'OH Rate', 0)
+    if 'Calculated Total Amount' not in df.columns:
+        df.insert(5, 'Calculated Total Amount', 0)
+    return df
+
+
+def upload_key_for(digest):
+    # The totals depend on the class totals mode, so it's part of the key too
+    if current_app.config['LEGACY_CLASS_TOTALS']:
+        return digest + '-legacy'
+    return digest
+
+
+def cached_upload(upload_key):
+    # Same bytes as an earlier upload, reuse the parsed frame
+    cached_path = upload_cache.lookup(upload_key)
+    if cached_path is None:
+        return None
+    update_rates(upload_cache, upload_key)
+    return dataset_store.link(dataset_store.new_key(), cached_path)
+
+
+def spool_upload(file):
+    # Copied to disk in chunks and hashed on the way, so the request never
+    # holds the whole workbook in memory
+    spool_dir = current_app.config['UPLOAD_SPOOL_DIR']
+    os.makedirs(spool_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(dir=spool_dir, suffix='.xlsx')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(SPOOL_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def process_spooled_upload(path, upload_key):
+    # Runs in the upload process pool; the spooled file goes either way
+    try:
+        return process_upload(path, upload_key)
+    finally:
+        os.unlink(path)
+
+
+@metrics.timed
+def store_upload(data):
+    upload_key = upload_key_for(hashlib.sha256(data).hexdigest())
+    return cached_upload(upload_key) or process_upload(BytesIO(data), upload_key)
+
+
+@metrics.timed
+def process_upload(file, upload_key):
+    # Callers look in the upload cache first, so each lookup is counted once
+    dataset_key = dataset_store.new_key()
+
+    metadata = {'rate_version': rate_book.version}
+
+    df = read_excel(file)
+    df = prepare_upload(df)
+    if current_app.config['PERSIST_INVOICES']:
+        job_queue.submit(save_invoices, df)
+
+    df = INVOICE_SCHEMA.compact(df)
+    if current_app.config['ARCHIVE_INVOICES']:
+        job_queue.submit(archive_invoices, df)
+    index = DatasetIndex.build(df)
+    rollups = build_rollups(df)
+    upload_cache.put(upload_key, df, index, rollups, metadata)
+    return dataset_store.put(dataset_key, df, index, rollups, metadata)
+
+
+@metrics.timed
+def archive_invoices(df):
+    return invoice_archive.add(df)
+
+
+@metrics.timed
+def save_invoices(df):
+    from flask_app.models.invoice import Invoice
+    return Invoice.upsert_frame(df, batch_size=current_app.config['INVOICE_BATCH_SIZE'])
+
+
+@metrics.timed
+def store_sheet_delta(url, data):
+    # The responses sheet only grows, so keep the processed sheet per URL and
+    # only parse responses newer than the latest one already in it
+    source_key = 'sheet-' + hashlib.sha256(url.encode()).hexdigest()
+    upload_key = hashlib.sha256(data).hexdigest()
+    if current_app.config['LEGACY_CLASS_TOTALS']:
+        source_key += '-legacy'
+        upload_key += '-legacy'
+
+    metadata = {'rate_version': rate_book.version}
+
+    # An unchanged sheet is still a full scan of the workbook XML, skip it
+    cached_path = upload_cache.lookup(upload_key)
+    if cached_path and upload_cache.get_metadata(upload_key).get('rate_version') == metadata['rate_version']:
+        return dataset_store.link(dataset_store.new_key(), cached_path)
+
+    existing = upload_cache.get(source_key)
+    if existing is not None:
+        existing = INVOICE_SCHEMA.compact(existing)
+    if existing is None or pd.isna(existing['Date'].max()):
+        df = prepare_upload(read_excel(BytesIO(data)))
+        if current_app.config['PERSIST_INVOICES']:
+            job_queue.submit(save_invoices, df)
+        df = INVOICE_SCHEMA.compact(df)
+        if current_app.config['ARCHIVE_INVOICES']:
+            job_queue.submit(archive_invoices, df)
+        upload_cache.put(source_key, df, DatasetIndex.build(df), build_rollups(df), metadata)
+        upload_cache.link(upload_key, upload_cache.path(source_key))
+        return dataset_store.link(dataset_store.new_key(), upload_cache.path(source_key))
+
+    # Stored responses worked out with older rates are repriced, not parsed again
+    repriced = upload_cache.get_metadata(source_key).get('rate_version') != metadata['rate_version']
+    if repriced:
+        existing = reprice(existing)
+
+    high_water = existing['Date'].max()
+    new = read_excel(BytesIO(data), since=high_water.to_pydatetime())
+    if not new.empty:
+        new = prepare_upload(new)
+        dates = pd.to_datetime(new['Date'], format=DATE_FORMAT, errors='coerce')
+        # Responses at the mark itself may already be stored
+        seen = set(existing.loc[existing['Date'] == high_water, 'Email Address'].astype(str))
+        keep = (dates > high_water) | ((dates == high_water) & ~new['Email Address'].astype(str).isin(seen))
+        new = new[keep.to_numpy()].reset_index(drop=True)
+
+    if not new.empty:
+        if current_app.config['PERSIST_INVOICES']:
+            job_queue.submit(save_invoices, new)
+        new = INVOICE_SCHEMA.compact(new)
+        if current_app.config['ARCHIVE_INVOICES']:
+            job_queue.submit(archive_invoices, new)
+        df = INVOICE_SCHEMA.concat([existing, new])
+        rollups = None if repriced else upload_cache.get_rollups(source_key)
+        if rollups is None:
+            rollups = build_rollups(df)
+        else:
+            rollups = rollups.replace_months(df, set(month_labels(new['Date'])) - {''}, current_app.config['LEGACY_CLASS_TOTALS'])
+        upload_cache.put(source_key, df, DatasetIndex.build(df), rollups, metadata)
+    elif repriced:
+        upload_cache.put(source_key, existing, rollups=build_rollups(existing), metadata=metadata)
+
+    upload_cache.link(upload_key, upload_cache.path(source_key))
+    return dataset_store.link(dataset_store.new_key(), upload_cache.path(source_key))
+
+
+def import_google_sheet(fetcher, url, full=False):
+    new_url = convert_google_sheet_url(url)
+    data = fetcher.fetch(new_url)
+    if full or not current_app.config['SHEET_INCREMENTAL']:
+        return store_upload(data)
+    return store_sheet_delta(new_url, data)
+
+
+@metrics.timed
+def calculate_invoices(df):
+    df = add_class_totals(df, legacy_last_column=current_app.config['LEGACY_CLASS_TOTALS'])
+    df = convert_to_number(df)
+    df = calculate_total(df)
+    return df
+
+
+@metrics.timed
+def apply_filters(df, filters, index=None):
+    month = filters.get('month', 0)
+    email = filters.get('email', '')
+    name = filters.get('name', '')
+
+    if index is not None:
+        # Look the rows up instead of scanning the columns
+        rows = index.select(month=month, email=email, name=name)
+        if rows is not None:
+            df = df.iloc[rows]
+    else:
+        if month != 0 and 'Date' in df.columns:
+            df = filter_by_month(df, 'Date', month)
+        if email:
+            df = filter_by_column(df, 'Email Address', email)
+        if name:
+            df = filter_by_column(df, 'Full Name', name)
+
+    # Drop rows where all values are NaN
+    df = df.dropna(how='all')
+
+    # Reset index after dropping rows
+    df = df.reset_index(drop=True)
+
+    return df
+
+
+def load_results():
+    # The uploaded dataset with the session's filters applied
+    df = load_dataset()
+    if df is None:
+        return None
+    index = dataset_store.get_index(session.get('dataset_id'))
+    return apply_filters(df, session.get('filters', {}), index)
+
+
+def dataset_version():
+    # Brings the dataset up to date with the rates first, so the version
+    # (and every ETag built from it) changes when its totals do
+    key = session.get('dataset_id')
+    update_rates(dataset_store, key)
+    return dataset_store.version(key)
+
+
+def filters_key():
+    return tuple(sorted(session.get('filters', {}).items()))
+
+
+def cache_headers(response, etag):
+    response.set_etag(etag, weak=True)
+    # Output depends on the session, so only the browser may keep it and it
+    # has to check back with the ETag before using it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
+def not_modified(etag):
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(etag):
+        return cache_headers(current_app.response_class(status=304), etag)
+    return None
+
+
+def cached_response(etag, build, mimetype):
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    body = response_cache.get(etag)
+    if body is None:
+        body = response_cache.put(etag, build())
+    return cache_headers(current_app.response_class(body, mimetype=mimetype), etag)
+
+
+def load_rollups():
+    key = session.get('dataset_id')
+    update_rates(dataset_store, key)
+    rollups = dataset_store.get_rollups(key)
+    if rollups is None:
+        df = load_dataset()
+        if df is None:
+            return None
+        rollups = dataset_store.put_rollups(key, build_rollups(df))
+    return rollups
+
+
+@metrics.timed
+def render_results(df, url):
+    # Only one page of rows is ever sent to the template
+    page_size = current_app.config['RESULTS_PAGE_SIZE']
+    pages = max(1, math.ceil(len(df) / page_size))
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    page_df = INVOICE_SCHEMA.expand(df.iloc[(page - 1) * page_size:page * page_size])
+
+    return render_template(
+        'results.html',
+        df=page_df,
+        classes=cell_classes(page_df),
+        currency=[col in CURRENCY_COLUMNS for col in df.columns],
+        page=page,
+        pages=pages,
+        total=len(df),
+        url=url,
+        filters=session.get('filters', {}),
+        zip=zip
+    )
+
+
 @bp.route('/', methods=['GET', 'POST'])
 def upload():
     if request.method == 'POST':
         if 'file' in request.files:
             file = request.files['file']
             if file:
+                path, digest = spool_upload(file)
+                upload_key = upload_key_for(digest)
+                dataset_key = cached_upload(upload_key)
+                if dataset_key:
+                    os.unlink(path)
+                    use_dataset(dataset_key)
+                    return redirect('/results')
+
+                # Parsing happens in the upload pool, this worker only polls for it
                 try:
-                    df = read_excel(file)
-                except Exception as e:
-                    return render_template('upload.html', error=f"Error processing file: {str(e)}")
+                    job_id = job_queue.submit_process(process_spooled_upload, path, upload_key)
+                except QueueFull:
+                    os.unlink(path)
+                    error = "The server is busy with other uploads, please try again in a minute."
+                    return render_template('upload.html', error=error), 429, {'Retry-After': '30'}
+                session['import_job'] = job_id
+                session['import_source'] = 'file'
+                return redirect(f'/import/{job_id}')
             else:
-                url = 'https://docs.google.com/spreadsheets/d/1-vVRybivqBrzzrXAfl5ikMP-7wJrOK5KO8lofohFwoc/edit?gid=1688582025'
-                
-                new_url = convert_google_sheet_url(url)
-                df = pd.read_excel(new_url, engine='openpyxl', dtype=str)
-                
-            df = refresh(df)
-            df = format_data(df)
-            
-            if 'Total # of Classes' not in df.columns:
-                df.insert(8, 'Total # of Classes', 0)
-            if 'Rate' not in df.columns:
-                df.insert(3, 'Rate', 0)
-            if 'OH Rate' not in df.columns:
-                df.insert(4, 'OH Rate', 0)
-            if 'Calculated Total Amount' not in df.columns:
-                df.insert(5, 'Calculated Total Amount', 0)
-
-            global df_global
-            df_global = df
-                
-            return redirect('/results')
-
-                
+                # Downloading the sheet can take a while, so do it off the request
+                fetcher = current_app.extensions['sheet_fetcher']
+                full = request.form.get('full_import') == '1'
+                job_id = job_queue.submit(import_google_sheet, fetcher, current_app.config['GOOGLE_SHEET_URL'], full)
+                session['import_job'] = job_id
+                session['import_source'] = 'sheet'
+                return redirect(f'/import/{job_id}')
+
     return render_template('upload.html')
 
 
+@bp.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return render_template('upload.html', error=f"The file is too large, the limit is {limit} MB."), 413
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({
+        "id": job['id'],
+        "status": job['status'],
+        "error": job.get('error')
+    })
+
+
+@bp.route('/import/<job_id>', methods=['GET'])
+def import_progress(job_id):
+    job = job_queue.status(job_id)
+    if job is None or session.get('import_job') != job_id:
+        return redirect('/')
+
+    if job['status'] == 'done':
+        session.pop('import_job', None)
+        session.pop('import_source', None)
+        use_dataset(job['result'])
+        return redirect('/results')
+    if job['status'] == 'failed':
+        session.pop('import_job', None)
+        source = session.pop('import_source', 'sheet')
+        return render_template('upload.html', error=f"Error processing {source}: {job['error']}")
+
+    return render_template('import.html', job=job)
+
+
+@bp.route('/months/<int:year>/<int:month>', methods=['GET'])
+def saved_month(year, month):
+    if not 1 <= month <= 12:
+        return redirect('/')
+
+    if not current_app.config['DATABASE_ENABLED']:
+        return render_template('upload.html', error="No database is configured")
+
+    from flask_app.models.invoice import Invoice
+    df = Invoice.load_month(year, month)
+    if df.empty:
+        return render_template('upload.html', error=f"No saved invoices for {month}/{year}")
+    df = INVOICE_SCHEMA.compact(df)
+
+    dataset_key = dataset_store.put(dataset_store.new_key(), df, DatasetIndex.build(df), build_rollups(df))
+    use_dataset(dataset_key)
+    return redirect('/results')
+
+
 @bp.route('/results', methods=['GET', 'POST'])
 def results():
-    global df_global
-    if df_global is not None:
-        df = df_global.copy()
+    version = dataset_version()
+    if version is not None:
         
-        # Check if filters are applied
-        month = int(request.form.get('month', 0))
-        email = request.form.get('email', '').strip()
-        name = request.form.get('name', '').strip()
-        
-        # Check if no filters are applied
-        if not any([month != '0', email, name]):
-            return redirect('/results')  # Refresh the page
-
         if request.method == 'POST':
-            # Apply filters if provided
-            if month != 0 and 'Date' in df.columns:
-                df = filter_by_month(df, 'Date', month)
-                df = refresh(df)                
-            if email:
-                df = filter_by_column(df, 'Email', email)
-            if name:
-                df = filter_by_column(df, 'Full Name', name)
-                
-            # Drop rows where all values are NaN
-            df = df.dropna(how='all')
-
-            # Reset index after dropping rows
-            df = df.reset_index(drop=True)
-            
-            # Iterate over each row and apply the addition function
-            for index in range(df.shape[0]):
-                df = df.dropna(how='all')
-                df = addition(df, index)
-                
-            df = convert_to_number(df)
-            df = calculate_total(df)
-            numbers_df = df.copy()
-            df = format_currency(df)
-            
-            df_global = df.copy()
-            
-            # Convert to HTML table
-            table_html = df.to_html(classes='table table-striped', index=False, na_rep='', max_rows=None, max_cols=None)
-            return render_template('results.html', table_html=table_html, df_global=df, numbers_df=numbers_df, zip=zip)
-
-        elif request.method == 'GET':
-            # If GET request, show all data without filters
-            # Iterate over each row and apply the addition function
-            for index in range(len(df)):
-                df = addition(df, index)
-                
-            df = convert_to_number(df)
-            df = calculate_total(df)
-            numbers_df = df.copy()
-            df = format_currency(df)
-            
-            df_global = df.copy()
-            
-            table_html = df.to_html(classes='table table-striped', index=False, na_rep='', max_rows=None, max_cols=None)
-            return render_template('results.html', table_html=table_html, df_global=df, numbers_df=numbers_df, zip=zip)
+            # New filters replace the old ones and are kept for paging and download
+            session['filters'] = {
+                'month': int(request.form.get('month', 0)),
+                'email': request.form.get('email', '').strip(),
+                'name': request.form.get('name', '').strip()
+            }
+
+        # Totals were calculated at upload, so this only selects rows
+        etag = response_cache.etag('results', version, filters_key(), request.args.get('page', 1, type=int))
+        return cached_response(etag, lambda: render_results(load_results(), '/results').encode(), 'text/html')
     return redirect('/')
 
 
-@bp.route('/download', methods=['POST'])
+@bp.route('/summary', methods=['GET'])
+def summary():
+    rollups = load_rollups()
+    if rollups is None:
+        return redirect('/')
+
+    month = request.args.get('month', '')
+    instructors, schools = rollups.for_month(month)
+    return render_template(
+        'summary.html',
+        months=rollups.months(),
+        month=month,
+        instructors=instructors,
+        schools=schools,
+        zip=zip
+    )
+
+
+@bp.route('/summary/data', methods=['GET'])
+def summary_data():
+    rollups = load_rollups()
+    if rollups is None:
+        return jsonify({"error": "No spreadsheet uploaded"}), 404
+
+    month = request.args.get('month', '')
+    instructors, schools = rollups.for_month(month)
+    return jsonify({
+        "months": rollups.months(),
+        "month": month,
+        "instructors": to_columns(instructors),
+        "schools": to_columns(schools)
+    })
+
+
+def results_page():
+    df = load_results()
+    page = slice_frame(
+        df,
+        offset=request.args.get('offset', 0, type=int),
+        limit=request.args.get('limit', current_app.config['RESULTS_PAGE_SIZE'], type=int),
+        sort=request.args.get('sort'),
+        descending=request.args.get('desc', 0, type=int) == 1
+    )
+    page = INVOICE_SCHEMA.expand(page)
+
+    return jsonify({
+        "total": len(df),
+        "offset": request.args.get('offset', 0, type=int),
+        "columns": list(page.columns),
+        "data": to_columns(page),
+        "flags": {col: values.tolist() for col, values in highlight_flags(page).items()}
+    })
+
+
+@bp.route('/results/data', methods=['GET'])
+def results_data():
+    version = dataset_version()
+    if version is None:
+        return jsonify({"error": "No spreadsheet uploaded"}), 404
+
+    etag = response_cache.etag('results_data', version, filters_key(), tuple(sorted(request.args.items())))
+    return cached_response(etag, lambda: results_page().get_data(), 'application/json')
+
+
+@bp.route('/archive/data', methods=['GET'])
+def archive_data():
+    # Submissions from every upload, e.g. ?from=2023-01&to=2024-12&name=tommy
+    columns = request.args.get('columns')
+    try:
+        df = invoice_archive.query(
+            start=request.args.get('from', ''),
+            end=request.args.get('to', ''),
+            email=request.args.get('email', '').strip(),
+            name=request.args.get('name', '').strip(),
+            columns=columns.split(',') if columns else None
+        )
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        logger.exception("Archive query failed")
+        return jsonify({"error": "Archive query failed"}), 500
+
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = request.args.get('limit', current_app.config['RESULTS_PAGE_SIZE'], type=int)
+    page = INVOICE_SCHEMA.expand(df.iloc[offset:offset + max(limit, 0)])
+    return jsonify({
+        "months": invoice_archive.months(),
+        "total": len(df),
+        "offset": offset,
+        "columns": list(page.columns),
+        "data": to_columns(page)
+    })
+
+
+@bp.route('/download', methods=['GET', 'POST'])
+@metrics.timed
 def download():
-    global df_global
-    if df_global is not None:
-        df = df_global.copy()
-        
-        output = BytesIO()
-            
-        # Create an Excel writer object
-        with pd.ExcelWriter(output, 
-                    engine='xlsxwriter', 
-                    engine_kwargs={'options': {'strings_to_numbers': True}},
-                ) as writer: 
-            
-            # Write DataFrame to Excel
-            df.to_excel(writer, sheet_name="Instructor Invoices", index=False)
-            
-            workbook = writer.book
-            worksheet = writer.sheets["Instructor Invoices"]
-            
-            # Autofit columns
-            for col_num, col in enumerate(df.columns):
-                max_length = max(df[col].astype(str).map(len).max(), len(col))
-                worksheet.set_column(col_num, col_num, max_length + 2)  # Adding extra space for padding
-            
-            # Apply autofilter
-            max_row = len(df) + 1
-            max_col = len(df.columns)
-            worksheet.autofilter(0, 0, max_row, max_col - 1)
-            
-            red_format = workbook.add_format({'bg_color': '#ED254E', 'bold': True})
-            
-            worksheet.conditional_format('N1:Y100', 
-                            {'type':     'cell',
-                            'criteria': 'greater than',
-                            'value':     4,
-                            'format':    red_format}
-                        )
-            worksheet.conditional_format('H1:H100', 
-                            {'type':     'cell',
-                            'criteria': 'greater than',
-                            'value':     4,
-                            'format':    red_format}
-                        )
-        
-        output.seek(0)
-        
+    version = dataset_version()
+    if version is not None:
+        export_format = request.values.get('format', 'xlsx').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unknown format: {export_format}"}), 400
+        writer, extension, mimetype = EXPORT_FORMATS[export_format]
+
+        etag = response_cache.etag('download', version, filters_key(), export_format)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        body = response_cache.get(etag)
+        if body is not None:
+            output = BytesIO(body)
+        else:
+            # Small files stay in memory, big ones spill to disk and are streamed
+            output = tempfile.SpooledTemporaryFile(max_size=current_app.config['EXPORT_SPOOL_MAX_SIZE'])
+            writer(INVOICE_SCHEMA.expand(load_results()), output)
+            if output.tell() <= response_cache.max_entry_bytes:
+                output.seek(0)
+                response_cache.put(etag, output.read())
+            output.seek(0)
         
         # Get the current month as an abbreviated name (e.g., 'Aug')
         current_month = pd.Timestamp.now().strftime('%b')
         current_year = pd.Timestamp.now().strftime('%y')
-        file_name = f"IAC_Invoice_Form_Updated_{current_month}{current_year}.xlsx"
+        file_name = f"IAC_Invoice_Form_Updated_{current_month}{current_year}.{extension}"
         
         # Send the file as a download
-        return send_file(output, as_attachment=True, download_name=file_name, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        response = send_file(output, as_attachment=True, download_name=file_name, mimetype=mimetype, etag=False)
+        return cache_headers(response, etag)
     return redirect('/results')
 
 
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are turned off"}), 404
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
 @bp.route('/see_all', methods=['GET'])
 def see_all():
-    global df_global
-    if df_global is not None:
-        df = df_global.copy()
-        # Iterate over each row and apply the addition function
-        for index in range(len(df)):
-            df = addition(df, index)
-        df = rename_columns(df)
-        df = convert_to_number(df)
-        df = calculate_total(df)
-        numbers_df = df.copy()
-        df = format_currency(df)
-
-        # Render the modified DataFrame as HTML
-        table_html = df.to_html(classes='table table-striped', index=False, na_rep='', max_rows=None, max_cols=None)
-        return render_template('results.html', table_html=table_html, df_global=df, numbers_df=numbers_df, zip=zip)
+    version = dataset_version()
+    if version is not None:
+        session.pop('filters', None)
+        etag = response_cache.etag('see_all', version, request.args.get('page', 1, type=int))
+        return cached_response(etag, lambda: render_results(load_dataset(), '/see_all').encode(), 'text/html')
 
     return redirect('/')
 
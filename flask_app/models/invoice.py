@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from flask_app import db
+from flask_app.utils.dataset_index import DATE_FORMAT
+from flask_app.utils.schema import SCHOOL_COLUMNS
+
+# Rows per INSERT statement
+BATCH_SIZE = 1000
+
+# Dataset column: table column
+INVOICE_COLUMNS = {
+    'Date': 'submitted_at',
+    'Email Address': 'email',
+    'Full Name': 'full_name',
+    'Rate': 'rate',
+    'OH Rate': 'oh_rate',
+    'Calculated Total Amount': 'calculated_total',
+    'Instructor Provided Total': 'instructor_total',
+    'Work Meetings': 'work_meetings',
+    'Admin Meetings': 'admin_meetings',
+    'Side Projects': 'side_projects',
+    'Invoices/Receipts': 'invoices_receipts',
+    'Total # of Classes': 'total_classes',
+    **{school: school.lower().replace(' ', '_') for school in SCHOOL_COLUMNS}
+}
+
+MONEY_COLUMNS = ['rate', 'oh_rate', 'calculated_total', 'instructor_total', 'side_projects', 'invoices_receipts']
+
+
+class UnsupportedDialect(ValueError):
+    pass
+
+
+class Invoice(db.Model):
+    __tablename__ = 'invoices'
+    __table_args__ = (
+        # Also serves month lookups, submitted_at is the leading column
+        db.UniqueConstraint('submitted_at', 'email', name='uq_invoices_submitted_at_email'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    submitted_at = db.Column(db.DateTime, nullable=False)
+    email = db.Column(db.String(255), nullable=False)
+    full_name = db.Column(db.String(255), nullable=False, default='')
+    rate = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    oh_rate = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    calculated_total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    instructor_total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    work_meetings = db.Column(db.Integer, nullable=False, default=0)
+    admin_meetings = db.Column(db.Integer, nullable=False, default=0)
+    side_projects = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    invoices_receipts = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    total_classes = db.Column(db.Integer, nullable=False, default=0)
+    arroyo = db.Column(db.Integer, nullable=False, default=0)
+    myford = db.Column(db.Integer, nullable=False, default=0)
+    tustin_ranch = db.Column(db.Integer, nullable=False, default=0)
+    ladera = db.Column(db.Integer, nullable=False, default=0)
+    anaheim_hills = db.Column(db.Integer, nullable=False, default=0)
+    historic_anaheim = db.Column(db.Integer, nullable=False, default=0)
+    north_tustin = db.Column(db.Integer, nullable=False, default=0)
+    san_juan_capistrano = db.Column(db.Integer, nullable=False, default=0)
+    hicks_canyon = db.Column(db.Integer, nullable=False, default=0)
+    orchard_hills = db.Column(db.Integer, nullable=False, default=0)
+    peters_canyon = db.Column(db.Integer, nullable=False, default=0)
+    tma = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def to_rows(cls, df):
+        columns = [col for col in INVOICE_COLUMNS if col in df.columns]
+        rows = df[columns].rename(columns=INVOICE_COLUMNS)
+        rows['submitted_at'] = pd.to_datetime(rows['submitted_at'], format=DATE_FORMAT, errors='coerce')
+        rows = rows.dropna(subset=['submitted_at'])
+        rows['email'] = rows['email'].fillna('').astype(str)
+        if 'full_name' in rows.columns:
+            rows['full_name'] = rows['full_name'].fillna('').astype(str)
+
+        # Keep the last answer when the same person submitted twice in a second
+        rows = rows.drop_duplicates(subset=['submitted_at', 'email'], keep='last')
+
+        records = rows.to_dict(orient='records')
+        for record in records:
+            record['submitted_at'] = record['submitted_at'].to_pydatetime()
+        return records
+
+    @classmethod
+    def upsert_frame(cls, df, batch_size=BATCH_SIZE):
+        records = cls.to_rows(df)
+        if not records:
+            return 0
+
+        dialect = db.engine.dialect.name
+        update_columns = [col for col in records[0] if col not in ('submitted_at', 'email')]
+
+        # One multi-row INSERT per batch, updating rows that already exist
+        with db.engine.begin() as connection:
+            for start in range(0, len(records), batch_size):
+                batch = records[start:start + batch_size]
+                connection.execute(cls.upsert_statement(dialect, batch, update_columns))
+
+        return len(records)
+
+    @classmethod
+    def upsert_statement(cls, dialect, batch, update_columns):
+        table = cls.__table__
+        if dialect == 'mysql':
+            stmt = mysql.insert(table).values(batch)
+            return stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in update_columns})
+        if dialect == 'postgresql':
+            stmt = postgresql.insert(table).values(batch)
+        elif dialect == 'sqlite':
+            stmt = sqlite.insert(table).values(batch)
+        else:
+            raise UnsupportedDialect(f"Saving invoices isn't supported on {dialect}, only on mysql, postgresql and sqlite")
+        return stmt.on_conflict_do_update(
+            index_elements=['submitted_at', 'email'],
+            set_={col: stmt.excluded[col] for col in update_columns}
+        )
+
+    @classmethod
+    def load_month(cls, year, month):
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        query = (
+            db.select(*(table_col for table_col in cls.__table__.c if table_col.name != 'id'))
+            .where(cls.submitted_at >= start, cls.submitted_at < end)
+            .order_by(cls.submitted_at)
+        )
+        with db.engine.connect() as connection:
+            df = pd.read_sql(query, connection)
+
+        df = df.rename(columns={v: k for k, v in INVOICE_COLUMNS.items()})
+        df['Date'] = pd.to_datetime(df['Date']).dt.strftime(DATE_FORMAT)
+        for col in MONEY_COLUMNS:
+            name = next(k for k, v in INVOICE_COLUMNS.items() if v == col)
+            df[name] = df[name].astype('float64')
+        return df[list(INVOICE_COLUMNS)]
@@ -0,0 +1,165 @@
+import fcntl
+import glob
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+from flask_app.utils.compact import INVOICE_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+PARTITION_FIELDS = pa.schema([('year', pa.int16()), ('month', pa.int8())])
+
+# A response is identified by when it was sent and who sent it, the same
+# as the invoices table's unique key
+KEY_COLUMNS = ['Date', 'Email Address']
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def month_code(label):
+    try:
+        year, month = (int(part) for part in label.split('-'))
+    except ValueError:
+        raise InvalidQuery(f"Invalid month: {label} (expected YYYY-MM)")
+    if not 1 <= month <= 12:
+        raise InvalidQuery(f"Invalid month: {label} (expected YYYY-MM)")
+    return year * 100 + month
+
+
+class InvoiceArchive:
+    # Every processed upload, kept as Parquet partitioned by month:
+    # ARCHIVE_DIR/year=2024/month=3/invoices.parquet. Parquet keeps min/max
+    # statistics per column and row group, and queries only open the months
+    # they ask for and only read the columns they need.
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.row_group_size = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config['ARCHIVE_DIR']
+        self.row_group_size = app.config['ARCHIVE_ROW_GROUP_SIZE']
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['invoice_archive'] = self
+
+    def partition_path(self, year, month):
+        return os.path.join(self.directory, f"year={year}", f"month={month}", 'invoices.parquet')
+
+    @contextmanager
+    def _locked(self):
+        # Uploads finish in several processes at once, and each partition
+        # is read, merged and written back as a whole
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add(self, df):
+        # Takes a compact dataset. Responses already archived are replaced,
+        # so uploading the same workbook twice doesn't count anything twice.
+        df = INVOICE_SCHEMA.compact(df)
+        dates = df['Date']
+        undated = int(dates.isna().sum())
+        if undated:
+            logger.warning("Not archiving %d responses without a date", undated)
+        df = df[dates.notna().to_numpy()]
+        if df.empty:
+            return 0
+
+        with self._locked():
+            for (year, month), rows in df.groupby([df['Date'].dt.year, df['Date'].dt.month], sort=True):
+                self._merge_partition(int(year), int(month), rows)
+        return len(df)
+
+    def _merge_partition(self, year, month, rows):
+        import pyarrow.parquet as pq
+
+        path = self.partition_path(year, month)
+        table = INVOICE_SCHEMA.to_arrow(rows)
+        if os.path.exists(path):
+            table = pa.concat_tables([pq.read_table(path, schema=INVOICE_SCHEMA.arrow_schema()), table])
+        # Dictionaries from different files don't line up until unified
+        table = table.unify_dictionaries()
+
+        # Latest copy of each response wins, then in date order so the Date
+        # statistics of each row group cover a narrow range
+        merged = table.to_pandas()
+        merged = merged.drop_duplicates(KEY_COLUMNS, keep='last').sort_values('Date', kind='stable')
+        table = INVOICE_SCHEMA.to_arrow(merged)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Hidden until it replaces the partition, so queries never see it
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, row_group_size=self.row_group_size, write_statistics=True)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def months(self):
+        labels = []
+        for year_dir in sorted(os.listdir(self.directory)):
+            if not year_dir.startswith('year='):
+                continue
+            for month_dir in os.listdir(os.path.join(self.directory, year_dir)):
+                if month_dir.startswith('month='):
+                    labels.append(f"{year_dir[5:]}-{int(month_dir[6:]):02d}")
+        return sorted(labels)
+
+    def query(self, start='', end='', email='', name='', columns=None):
+        # start and end are inclusive "YYYY-MM" months. Months outside them
+        # are pruned by directory, email and name are matched like the
+        # results filters (any part, any case) while the files are scanned.
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        schema = INVOICE_SCHEMA.arrow_schema()
+        columns = list(columns or schema.names)
+        unknown = [col for col in columns if col not in schema.names]
+        if unknown:
+            raise InvalidQuery(f"Unknown columns: {', '.join(unknown)}")
+
+        conditions = []
+        period = pc.field('year').cast(pa.int32()) * 100 + pc.field('month').cast(pa.int32())
+        if start:
+            conditions.append(period >= month_code(start))
+        if end:
+            conditions.append(period <= month_code(end))
+
+        # Only finished partition files, never anything else left in the
+        # directory
+        files = sorted(glob.glob(self.partition_path('*', '*')))
+        dataset = ds.dataset(
+            files,
+            schema=pa.unify_schemas([schema, PARTITION_FIELDS]),
+            format='parquet',
+            partitioning=ds.partitioning(PARTITION_FIELDS, flavor='hive'),
+            partition_base_dir=self.directory
+        )
+        for col, value in (('Email Address', email), ('Full Name', name)):
+            if value:
+                text = pc.field(col).cast(pa.string())
+                conditions.append(pc.match_substring(text, value, ignore_case=True))
+
+        condition = None
+        for part in conditions:
+            condition = part if condition is None else condition & part
+
+        table = dataset.to_table(columns=columns, filter=condition)
+        df = table.to_pandas()
+        if 'Date' in df.columns:
+            df = df.sort_values('Date', kind='stable').reset_index(drop=True)
+        return df
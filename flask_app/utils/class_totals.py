@@ -0,0 +1,34 @@
+import pandas as pd
+
+from flask_app.utils.schema import SCHOOL_COLUMNS
+
+# Index of the first column the legacy total includes
+START_COL = 11
+
+
+def paid_schools(legacy_last_column=True):
+    # The schools whose classes are paid, for a workbook laid out like the form
+    return SCHOOL_COLUMNS[:-1] if legacy_last_column else SCHOOL_COLUMNS
+
+
+def add_class_totals(df, legacy_last_column=True):
+    # Ensure 'Total # of Classes' column exists
+    if 'Total # of Classes' not in df.columns:
+        df['Total # of Classes'] = 0
+
+    # The old row-by-row loop stored the running total before adding each
+    # value, so the last column never made it into the stored total.
+    # legacy_last_column keeps that behavior so existing invoices don't change.
+    # It also summed by position, from column 11 on, which counts other
+    # columns too when a workbook isn't laid out like the form (e.g. a
+    # re-uploaded download). Only the corrected total goes by school name.
+    if legacy_last_column:
+        counts = df.iloc[:, START_COL:len(df.columns) - 1]
+    else:
+        counts = df.reindex(columns=paid_schools(legacy_last_column))
+
+    # Coerce every school column in one pass and sum across the row
+    counts = counts.apply(pd.to_numeric, errors='coerce')
+    df['Total # of Classes'] = counts.fillna(0).sum(axis=1)
+
+    return df
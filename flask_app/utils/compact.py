@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from flask_app.utils.dataset_index import DATE_FORMAT
+from flask_app.utils.schema import COUNT_COLUMNS, CURRENCY_COLUMNS, DATASET_COLUMNS
+
+# Smallest unsigned type that holds each count column's largest value
+COUNT_DTYPES = [(np.iinfo('uint8').max, 'uint8'), (np.iinfo('uint16').max, 'uint16'), (np.iinfo('uint32').max, 'uint32')]
+
+
+def count_dtype(values):
+    if len(values) == 0:
+        return 'uint8'
+    if values.min() < 0:
+        return 'int64'
+    largest = values.max()
+    for limit, dtype in COUNT_DTYPES:
+        if largest <= limit:
+            return dtype
+    return 'int64'
+
+
+class DatasetSchema:
+    # How a processed dataset is kept between requests: dates as datetime64,
+    # text as categoricals, money as whole cents and counts in the smallest
+    # unsigned type that fits. expand() turns (a page of) it back into what
+    # the table, the JSON API and the exports show.
+
+    def __init__(self, columns, dates, text, money, counts):
+        self.columns = list(columns)
+        self.dates = list(dates)
+        self.text = list(text)
+        self.money = list(money)
+        self.counts = list(counts)
+
+    def ordered(self, df):
+        # Schema columns in schema order, anything unexpected after them
+        known = [col for col in self.columns if col in df.columns]
+        extra = [col for col in df.columns if col not in self.columns]
+        return df[known + extra]
+
+    def is_compact(self, df):
+        # Processed frames always have dates as strings and compact ones never do
+        dates = [col for col in self.dates if col in df.columns]
+        if dates:
+            return all(pd.api.types.is_datetime64_any_dtype(df[col]) for col in dates)
+        text = [col for col in self.text if col in df.columns]
+        return bool(text) and all(isinstance(df[col].dtype, pd.CategoricalDtype) for col in text)
+
+    def compact(self, df):
+        if self.is_compact(df):
+            return df
+        df = self.ordered(df)
+        data = {}
+        for col in df.columns:
+            values = df[col]
+            if col in self.dates:
+                data[col] = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+            elif col in self.text:
+                data[col] = values.astype('string').astype('category')
+            elif col in self.money:
+                dollars = pd.to_numeric(values, errors='coerce').fillna(0).to_numpy(dtype='float64')
+                data[col] = np.rint(dollars * 100).astype('int64')
+            elif col in self.counts:
+                numbers = pd.to_numeric(values, errors='coerce').fillna(0).to_numpy(dtype='int64')
+                data[col] = numbers.astype(count_dtype(numbers))
+            else:
+                data[col] = values.to_numpy()
+        return pd.DataFrame(data, index=df.index, columns=df.columns)
+
+    def concat(self, frames):
+        # Categoricals with different categories would concat to object
+        df = pd.concat(frames, ignore_index=True)
+        for col in self.text:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        return df
+
+    def arrow_schema(self):
+        # One fixed type per column, for files that must all share a schema.
+        # Counts are widened to uint32 since each frame picks its own size.
+        fields = []
+        for col in self.columns:
+            if col in self.dates:
+                fields.append(pa.field(col, pa.timestamp('ns')))
+            elif col in self.text:
+                fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+            elif col in self.money:
+                fields.append(pa.field(col, pa.int64()))
+            elif col in self.counts:
+                fields.append(pa.field(col, pa.uint32()))
+            else:
+                fields.append(pa.field(col, pa.string()))
+        return pa.schema(fields)
+
+    def to_arrow(self, df):
+        # A compact frame as a table with exactly arrow_schema()'s columns
+        schema = self.arrow_schema()
+        arrays = []
+        for field in schema:
+            if field.name in df.columns:
+                arrays.append(pa.array(df[field.name], from_pandas=True).cast(field.type))
+            elif field.name in self.money or field.name in self.counts:
+                # Same as compact() does with missing numbers
+                arrays.append(pa.array(np.zeros(len(df), dtype='int64')).cast(field.type))
+            else:
+                arrays.append(pa.nulls(len(df), field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def expand(self, df):
+        data = {}
+        for col in df.columns:
+            values = df[col]
+            if col in self.dates:
+                data[col] = values.dt.strftime(DATE_FORMAT)
+            elif col in self.text:
+                data[col] = values.astype(object).where(values.notna(), None)
+            elif col in self.money:
+                data[col] = values.to_numpy(dtype='float64') / 100
+            elif col in self.counts:
+                data[col] = values.to_numpy(dtype='int64')
+            else:
+                data[col] = values.to_numpy()
+        return pd.DataFrame(data, index=df.index, columns=df.columns)
+
+
+INVOICE_SCHEMA = DatasetSchema(
+    DATASET_COLUMNS,
+    dates=['Date'],
+    text=['Email Address', 'Full Name'],
+    money=CURRENCY_COLUMNS,
+    counts=COUNT_COLUMNS
+)
@@ -0,0 +1,82 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Exports are already compressed (xlsx) or sent as files, so only pages and API responses
+COMPRESSIBLE_MIMETYPES = ('text/html', 'application/json')
+
+
+class Compression:
+    # Compresses HTML and JSON responses with brotli or gzip, whichever the
+    # client prefers. Responses that carry an ETag were rendered from the
+    # response cache, so their compressed bodies are cached alongside them.
+
+    def __init__(self, app=None, cache=None):
+        self.cache = cache
+        self.enabled = False
+        self.min_size = 0
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['COMPRESS_ENABLED']
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        app.extensions['compression'] = self
+        if self.enabled:
+            app.after_request(self.compress)
+
+    def choose_encoding(self, accept_encodings):
+        gzip_quality = accept_encodings['gzip']
+        if brotli is not None and accept_encodings['br'] and accept_encodings['br'] >= gzip_quality:
+            return 'br'
+        if gzip_quality:
+            return 'gzip'
+        return None
+
+    def encode(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def compress(self, response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or request.method == 'HEAD'
+        ):
+            return response
+
+        encoding = self.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        compressed = None
+        if etag and self.cache is not None:
+            key = f"{etag}.{encoding}"
+            compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = self.encode(body, encoding)
+            if etag and self.cache is not None:
+                self.cache.put(key, compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,119 @@
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# How refresh() writes the Date column
+DATE_FORMAT = '%b %d %y %I:%M:%S %p'
+
+
+class TextIndex:
+    # Case-insensitive substring search over a text column. Each distinct
+    # value is split into trigrams once, so a search only looks at the
+    # values sharing all of the query's trigrams and then at their rows.
+
+    def __init__(self, codes, values):
+        self.codes = np.asarray(codes, dtype='int32')
+        self.values = list(values)
+
+        postings = {}
+        for value_id, value in enumerate(self.values):
+            for gram in {value[i:i + 3] for i in range(len(value) - 2)}:
+                postings.setdefault(gram, []).append(value_id)
+        self.trigrams = {gram: np.array(ids, dtype='int32') for gram, ids in postings.items()}
+
+        # Rows grouped by value, so a value's rows are one contiguous slice
+        self.order = np.argsort(self.codes, kind='stable')
+        self.sorted_codes = self.codes[self.order]
+
+    @classmethod
+    def build(cls, col):
+        codes, uniques = pd.factorize(col.astype('string').str.lower())
+        return cls(codes, uniques)
+
+    def matching_values(self, query):
+        query = query.lower()
+        if len(query) < 3:
+            # Too short for trigrams, but there are far fewer values than rows
+            candidates = range(len(self.values))
+        else:
+            grams = {query[i:i + 3] for i in range(len(query) - 2)}
+            if not all(gram in self.trigrams for gram in grams):
+                return np.array([], dtype='int32')
+            candidates = reduce(np.intersect1d, (self.trigrams[gram] for gram in grams))
+        return np.array([i for i in candidates if query in self.values[i]], dtype='int32')
+
+    def rows(self, value_ids):
+        starts = np.searchsorted(self.sorted_codes, value_ids, side='left')
+        ends = np.searchsorted(self.sorted_codes, value_ids, side='right')
+        if not len(value_ids):
+            return np.array([], dtype='int64')
+        return np.concatenate([self.order[s:e] for s, e in zip(starts, ends)])
+
+    def search(self, query):
+        return np.sort(self.rows(self.matching_values(query)))
+
+    def to_arrow(self):
+        # Missing values have code -1 and are stored as nulls
+        indices = pa.array(self.codes, mask=self.codes < 0, type=pa.int32())
+        return pa.DictionaryArray.from_arrays(indices, pa.array(self.values, type=pa.string()))
+
+    @classmethod
+    def from_arrow(cls, array):
+        array = array.combine_chunks() if isinstance(array, pa.ChunkedArray) else array
+        codes = array.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return cls(codes, array.dictionary.to_pylist())
+
+
+class DatasetIndex:
+    # Lookups for the /results filters, built once when a dataset is stored
+    # and kept next to it on disk
+
+    def __init__(self, dates, email, name):
+        self.dates = dates
+        self.email = email
+        self.name = name
+
+        months = pd.DatetimeIndex(dates).month.to_numpy(dtype='float64', na_value=0).astype('int8')
+        order = np.argsort(months, kind='stable')
+        bounds = np.searchsorted(months[order], np.arange(1, 14))
+        self.month_rows = {
+            month: order[bounds[month - 1]:bounds[month]] for month in range(1, 13)
+        }
+
+    @classmethod
+    def build(cls, df):
+        if 'Date' in df.columns:
+            dates = pd.to_datetime(df['Date'], format=DATE_FORMAT, errors='coerce').to_numpy()
+        else:
+            dates = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+        empty = pd.Series([None] * len(df), dtype=object)
+        email = TextIndex.build(df['Email Address'] if 'Email Address' in df.columns else empty)
+        name = TextIndex.build(df['Full Name'] if 'Full Name' in df.columns else empty)
+        return cls(dates, email, name)
+
+    def to_table(self):
+        return pa.table({
+            'date': pa.array(self.dates),
+            'email': self.email.to_arrow(),
+            'name': self.name.to_arrow()
+        })
+
+    @classmethod
+    def from_table(cls, table):
+        dates = table.column('date').to_numpy()
+        return cls(dates, TextIndex.from_arrow(table.column('email')), TextIndex.from_arrow(table.column('name')))
+
+    def select(self, month=0, email='', name=''):
+        # Row positions matching every filter that was given
+        selections = []
+        if month:
+            selections.append(self.month_rows.get(month, np.array([], dtype='int64')))
+        if email:
+            selections.append(self.email.search(email))
+        if name:
+            selections.append(self.name.search(name))
+        if not selections:
+            return None
+        return reduce(np.intersect1d, (np.sort(rows) for rows in selections))
@@ -0,0 +1,276 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+
+from flask_app.utils.dataset_index import DatasetIndex
+from flask_app.utils.rollups import MonthlyRollups
+
+# Loaded indexes and rollups kept in memory per worker
+INDEX_CACHE_SIZE = 16
+
+# Files kept next to each dataset and removed along with it
+SIDECAR_SUFFIXES = ('.idx', '.agg')
+
+
+def sidecar_paths(path):
+    base = path[:-len('.arrow')]
+    return [base + suffix for suffix in SIDECAR_SUFFIXES]
+
+
+class DatasetStore:
+    # Keeps DataFrames as Arrow IPC files on local disk. Every gunicorn
+    # worker reads the same files through a memory map, and least recently
+    # used files are evicted once the size, count or idle time limits are hit.
+
+    def __init__(self, app=None, config_prefix='DATASET'):
+        self.config_prefix = config_prefix
+        self.directory = None
+        self.max_bytes = 0
+        self.max_entries = 0
+        self.ttl = 0
+        self._loaded = OrderedDict()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        prefix = self.config_prefix
+        self.directory = app.config[f'{prefix}_DIR']
+        self.max_bytes = app.config[f'{prefix}_CACHE_MAX_BYTES']
+        self.max_entries = app.config[f'{prefix}_CACHE_MAX_ENTRIES']
+        # Seconds an entry may go unused before it is dropped, 0 to keep forever
+        self.ttl = app.config.get(f'{prefix}_CACHE_TTL', 0)
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions[f'{prefix.lower()}_store'] = self
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def index_path(self, key):
+        return os.path.join(self.directory, f"{key}.idx")
+
+    def rollups_path(self, key):
+        return os.path.join(self.directory, f"{key}.agg")
+
+    def new_key(self):
+        return uuid.uuid4().hex
+
+    def _expired(self, mtime):
+        return self.ttl and time.time() - mtime > self.ttl
+
+    def _touch(self, path):
+        # Mark as recently used for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def _write_table(self, path, table):
+        # Write to a temp file first so other workers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def put(self, key, df, index=None, rollups=None, metadata=None):
+        # Sidecars go first so a visible dataset always has them
+        if index is not None:
+            self._write_table(self.index_path(key), index.to_table())
+        if rollups is not None:
+            self._write_table(self.rollups_path(key), rollups.to_table())
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Each write gets its own revision, so versions never repeat
+        metadata = {**table.schema.metadata, **(metadata or {}), 'revision': uuid.uuid4().hex}
+        self._write_table(self.path(key), table.replace_schema_metadata(metadata))
+
+        self.evict()
+        return key
+
+    def _link_file(self, source_path, path):
+        tmp_path = os.path.join(self.directory, f"{uuid.uuid4().hex}.tmp")
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+
+    def link(self, key, source_path):
+        # Reuse a file from another store without reading it; falls back to
+        # a copy when the two directories are on different filesystems
+        for source_sidecar, sidecar in zip(sidecar_paths(source_path), sidecar_paths(self.path(key))):
+            if os.path.exists(source_sidecar):
+                self._link_file(source_sidecar, sidecar)
+        self._link_file(source_path, self.path(key))
+        self._touch(self.path(key))
+
+        self.evict()
+        return key
+
+    def contains(self, key):
+        if not key:
+            return False
+        path = self.path(key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        if self._expired(mtime):
+            self.delete(key)
+            return False
+        self._touch(path)
+        return True
+
+    def get(self, key):
+        if not self.contains(key):
+            return None
+        try:
+            with pa.memory_map(self.path(key), 'r') as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        except FileNotFoundError:
+            return None
+
+    def version(self, key):
+        # The revision stamped in by put(), with the rates the totals were
+        # worked out with. Files are replaced on every write, and inodes and
+        # mtimes can both repeat or move without the data changing.
+        if not self.contains(key):
+            return None
+        metadata = self.get_metadata(key)
+        revision = metadata.get('revision')
+        if revision is None:
+            # Written before revisions were kept
+            revision = self._content_hash(key)
+            if revision is None:
+                return None
+        return f"{key}-{revision}-{metadata.get('rate_version', '')}"
+
+    def _content_hash(self, key):
+        digest = hashlib.sha256()
+        try:
+            with open(self.path(key), 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()[:32]
+
+    def get_metadata(self, key):
+        # Only the schema at the end of the file is read
+        if not self.contains(key):
+            return {}
+        try:
+            with pa.memory_map(self.path(key), 'r') as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+        except FileNotFoundError:
+            return {}
+        return {name.decode(): value.decode() for name, value in metadata.items() if name != b'pandas'}
+
+    def _get_sidecar(self, path, loader):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        # Rebuilding from the table is cheap but not free, so keep recent ones
+        cache_key = (path, mtime)
+        if cache_key in self._loaded:
+            self._loaded.move_to_end(cache_key)
+            return self._loaded[cache_key]
+
+        try:
+            with pa.memory_map(path, 'r') as source:
+                value = loader(pa.ipc.open_file(source).read_all())
+        except FileNotFoundError:
+            return None
+
+        self._loaded[cache_key] = value
+        while len(self._loaded) > INDEX_CACHE_SIZE:
+            self._loaded.popitem(last=False)
+        return value
+
+    def get_index(self, key):
+        if not key:
+            return None
+        return self._get_sidecar(self.index_path(key), DatasetIndex.from_table)
+
+    def get_rollups(self, key):
+        if not key:
+            return None
+        return self._get_sidecar(self.rollups_path(key), MonthlyRollups.from_table)
+
+    def put_rollups(self, key, rollups):
+        # For datasets stored before rollups were kept
+        if self.contains(key):
+            self._write_table(self.rollups_path(key), rollups.to_table())
+        return rollups
+
+    def delete(self, key):
+        if not key:
+            return
+        for path in [self.path(key)] + sidecar_paths(self.path(key)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.arrow'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                size = stat.st_size
+                for sidecar in sidecar_paths(entry.path):
+                    if os.path.exists(sidecar):
+                        size += os.path.getsize(sidecar)
+                entries.append((stat.st_mtime, size, entry.path))
+
+        # Oldest first
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (
+            total_bytes > self.max_bytes
+            or len(entries) > self.max_entries
+            or self._expired(entries[0][0])
+        ):
+            _, size, path = entries.pop(0)
+            for stale in [path] + sidecar_paths(path):
+                try:
+                    os.unlink(stale)
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+
+
+class UploadCache(DatasetStore):
+    # Parsed uploads keyed by a hash of the file bytes, so uploading the same
+    # workbook again skips parsing and normalization entirely
+
+    def __init__(self, app=None, config_prefix='UPLOAD'):
+        self.hits = 0
+        self.misses = 0
+        super().__init__(app, config_prefix)
+
+    def lookup(self, key):
+        if self.contains(key):
+            self.hits += 1
+            return self.path(key)
+        self.misses += 1
+        return None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
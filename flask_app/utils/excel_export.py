@@ -0,0 +1,73 @@
+import pandas as pd
+
+from flask_app.utils.schema import CURRENCY_COLUMNS, SCHOOL_COLUMNS
+
+SHEET_NAME = "Instructor Invoices"
+
+# Highlight cells in these columns when they are over the limit
+HIGHLIGHT_COLUMNS = ['Work Meetings'] + SCHOOL_COLUMNS
+HIGHLIGHT_LIMIT = 4
+
+# Rows converted to Python values at a time
+WRITE_CHUNK_ROWS = 10000
+
+
+def column_width(col, name):
+    # Widest cell as it will be shown, worked out from the column's extremes
+    # instead of formatting every value
+    if col.empty:
+        return len(name)
+    if name in CURRENCY_COLUMNS and pd.api.types.is_numeric_dtype(col):
+        values = col.fillna(0)
+        widest = len(f"${values.abs().max():,.2f}") + (1 if (values < 0).any() else 0)
+    elif pd.api.types.is_integer_dtype(col):
+        widest = max(len(str(col.max())), len(str(col.min())))
+    else:
+        widest = col.astype(str).str.len().max()
+    return max(widest, len(name))
+
+
+def write_invoices(df, output):
+    # constant_memory flushes each row to disk as soon as the next one starts,
+    # so only one row of cells is ever held by xlsxwriter
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(SHEET_NAME)
+
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    money_format = workbook.add_format({'num_format': '$#,##0.00'})
+    red_format = workbook.add_format({'bg_color': '#ED254E', 'bold': True})
+
+    columns = list(df.columns)
+    for col_num, name in enumerate(columns):
+        cell_format = money_format if name in CURRENCY_COLUMNS else None
+        worksheet.set_column(col_num, col_num, column_width(df[name], name) + 2, cell_format)  # Adding extra space for padding
+
+    worksheet.write_row(0, 0, columns, header_format)
+
+    # A chunk of rows at a time to plain Python lists, missing values as
+    # blanks, so memory doesn't grow with the size of the export
+    for start in range(0, len(df), WRITE_CHUNK_ROWS):
+        chunk = df.iloc[start:start + WRITE_CHUNK_ROWS]
+        values = [chunk[name].astype(object).where(chunk[name].notna(), None).tolist() for name in columns]
+        for row_num, row in enumerate(zip(*values), start=start + 1):
+            worksheet.write_row(row_num, 0, row)
+
+    # Apply autofilter
+    last_row = len(df)
+    worksheet.autofilter(0, 0, last_row, len(columns) - 1)
+
+    if last_row:
+        for name in HIGHLIGHT_COLUMNS:
+            if name in columns:
+                col_num = columns.index(name)
+                worksheet.conditional_format(1, col_num, last_row, col_num, {
+                    'type': 'cell',
+                    'criteria': 'greater than',
+                    'value': HIGHLIGHT_LIMIT,
+                    'format': red_format
+                })
+
+    workbook.close()
+    return output
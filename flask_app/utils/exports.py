@@ -0,0 +1,31 @@
+import pyarrow as pa
+
+from flask_app.utils.excel_export import write_invoices
+
+
+def write_csv(df, output):
+    df.to_csv(output, index=False, encoding='utf-8')
+    return output
+
+
+def write_parquet(df, output):
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), output)
+    return output
+
+
+def write_arrow(df, output):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_file(output, table.schema) as writer:
+        writer.write_table(table)
+    return output
+
+
+# format: (writer, file extension, mimetype)
+EXPORT_FORMATS = {
+    'xlsx': (write_invoices, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (write_csv, 'csv', 'text/csv'),
+    'parquet': (write_parquet, 'parquet', 'application/vnd.apache.parquet'),
+    'arrow': (write_arrow, 'arrow', 'application/vnd.apache.arrow.file')
+}
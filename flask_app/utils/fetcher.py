@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import tempfile
+import urllib.error
+import urllib.request
+
+
+class SheetFetcher:
+    # Downloads a spreadsheet export and remembers its ETag/Last-Modified.
+    # The next fetch of the same URL sends them back, and a 304 answer is
+    # served from the copy kept on disk instead of downloading again.
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.timeout = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config['SHEET_CACHE_DIR']
+        self.timeout = app.config['SHEET_FETCH_TIMEOUT']
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['sheet_fetcher'] = self
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.directory, name)
+        return f"{base}.json", f"{base}.xlsx"
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def fetch(self, url):
+        meta_path, body_path = self._paths(url)
+
+        headers = {}
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            meta = {}
+        if meta and os.path.exists(body_path):
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read()
+                meta = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                }
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+            with open(body_path, 'rb') as f:
+                return f.read()
+
+        # Body first, so the validators never point at a missing file
+        self._write(body_path, data)
+        self._write(meta_path, json.dumps(meta).encode())
+
+        return data
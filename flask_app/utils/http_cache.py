@@ -0,0 +1,68 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    # Rendered pages and exports kept in memory per worker, keyed by their
+    # ETag. Least recently used bodies are dropped once the total size goes
+    # over RESPONSE_CACHE_MAX_BYTES, and bodies bigger than
+    # RESPONSE_CACHE_MAX_ENTRY_BYTES are never kept.
+
+    def __init__(self, app=None):
+        self.max_bytes = 0
+        self.max_entry_bytes = 0
+        self.salt = ''
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_bytes = app.config['RESPONSE_CACHE_MAX_BYTES']
+        self.max_entry_bytes = min(app.config['RESPONSE_CACHE_MAX_ENTRY_BYTES'], self.max_bytes)
+        # Pages rendered by an older version of the templates get new ETags
+        self.salt = template_stamp(os.path.join(app.root_path, app.template_folder))
+        app.extensions['response_cache'] = self
+
+    def etag(self, *parts):
+        return hashlib.sha256(repr((self.salt,) + parts).encode()).hexdigest()[:32]
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_entry_bytes:
+            return body
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return body
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self._size}
+
+
+def template_stamp(directory):
+    latest = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+    return str(latest)
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pandas as pd
+
+from flask_app.utils.schema import COLUMN_RENAMES, COUNT_COLUMNS
+
+# Rows handed to pandas at a time
+CHUNK_SIZE = 5000
+
+# Same strings pd.read_excel treats as missing
+NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null'
+}
+
+
+def to_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value)
+    if value in NA_VALUES:
+        return None
+    return value
+
+
+def build_chunk(rows, columns):
+    data = {}
+    for name, values in zip(columns, zip(*rows)):
+        if name in COUNT_COLUMNS:
+            data[name] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0)
+        elif name == 'Date' and all(isinstance(v, datetime) or v is None for v in values):
+            data[name] = pd.to_datetime(pd.Series(values, dtype=object))
+        else:
+            data[name] = pd.Series([to_text(v) for v in values], dtype=object)
+    return pd.DataFrame(data, columns=columns)
+
+
+def older_than(value, since):
+    # Only real timestamps can be compared; anything else is kept
+    return isinstance(value, datetime) and value < since
+
+
+def iter_chunks(file, chunk_size=CHUNK_SIZE, since=None):
+    # read_only streams rows from the sheet XML instead of building the whole
+    # workbook in memory, so only one chunk of Python values exists at a time
+    # openpyxl is only needed once someone uploads, see warm_up()
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        header = list(next(sheet.iter_rows(max_row=1, values_only=True), ()))
+
+        # Exported sheets are often formatted far past the real data, so
+        # trailing blank header cells don't count as columns
+        while header and header[-1] is None:
+            header.pop()
+        if not header:
+            return
+
+        columns = [
+            COLUMN_RENAMES.get(name, name) if name is not None else f"Unnamed: {i}"
+            for i, name in enumerate(header)
+        ]
+        width = len(columns)
+        padding = (None,) * width
+        # With a high-water mark, older responses are skipped before any
+        # of their cells are converted
+        date_col = columns.index('Date') if since is not None and 'Date' in columns else None
+        rows = sheet.iter_rows(min_row=2, max_col=width, values_only=True)
+
+        chunk = []
+        blank_rows = 0
+        for row in rows:
+            # Hold blank rows back until a real row follows them, so the
+            # empty formatted rows after the last response are never built
+            if row.count(None) == len(row):
+                blank_rows += 1
+                continue
+            if date_col is not None and older_than(row[date_col], since):
+                blank_rows = 0
+                continue
+            if len(row) < width:
+                row = row + padding[len(row):]
+            if blank_rows:
+                chunk.extend([padding] * blank_rows)
+                blank_rows = 0
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield build_chunk(chunk, columns)
+                chunk = []
+        if chunk:
+            yield build_chunk(chunk, columns)
+    finally:
+        workbook.close()
+
+
+def read_workbook(file, chunk_size=CHUNK_SIZE, since=None):
+    chunks = list(iter_chunks(file, chunk_size, since))
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    return df
@@ -0,0 +1,171 @@
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+def init_process(config):
+    # Each pool process builds its own app, the same as a gunicorn worker,
+    # with the config of the app that started the pool
+    from flask_app import create_app
+    create_app(config)
+
+
+def run_process_job(job_id, fn, args):
+    from flask_app import job_queue, metrics
+    job_queue._run(job_id, fn, args)
+    return metrics.take()
+
+
+def process_config(config):
+    # Only plain values can be sent to a spawned process
+    return {key: value for key, value in config.items() if isinstance(value, (str, int, float, bool, type(None)))}
+
+
+class JobQueue:
+    # Runs slow work on a background thread pool. Job state is written to
+    # small JSON files so any gunicorn worker can answer a status check,
+    # not just the one that started the job.
+
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None
+        self.ttl = 0
+        self.executor = None
+        self.processes = None
+        self.process_workers = 0
+        self.process_queue_size = 0
+        self._outstanding = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config['JOBS_DIR']
+        self.ttl = app.config['JOB_TTL']
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config['JOB_WORKERS'],
+            thread_name_prefix='import-job'
+        )
+        # The process pool is started on first use, in the worker that needs it
+        self.processes = None
+        self.process_workers = app.config['UPLOAD_WORKERS']
+        self.process_queue_size = app.config['UPLOAD_QUEUE_SIZE']
+        self._outstanding = 0
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['job_queue'] = self
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, job_id, **state):
+        state['id'] = job_id
+        state['updated'] = time.time()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(job_id))
+
+    def _run(self, job_id, fn, args):
+        self._write(job_id, status='running')
+        try:
+            with self.app.app_context():
+                result = fn(*args)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            self._write(job_id, status='failed', error=str(e))
+        else:
+            self._write(job_id, status='done', result=result)
+
+    def submit(self, fn, *args):
+        self.prune()
+        job_id = uuid.uuid4().hex
+        self._write(job_id, status='pending')
+        self.executor.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def submit_process(self, fn, *args):
+        # CPU heavy work runs in a pool of processes so it never holds the
+        # GIL of a worker that is serving requests. Only so many jobs may be
+        # queued or running at once, after that QueueFull is raised and the
+        # caller should ask the client to come back later. The pool and the
+        # limit belong to this worker, other gunicorn workers have their own.
+        with self._lock:
+            if self._outstanding >= self.process_queue_size:
+                raise QueueFull()
+            self._outstanding += 1
+
+        try:
+            self.prune()
+            job_id = uuid.uuid4().hex
+            self._write(job_id, status='pending')
+            try:
+                future = self._process_pool().submit(run_process_job, job_id, fn, args)
+            except BrokenProcessPool:
+                # A process died (out of memory, killed), start a new pool
+                self.processes = None
+                future = self._process_pool().submit(run_process_job, job_id, fn, args)
+        except Exception:
+            with self._lock:
+                self._outstanding -= 1
+            raise
+
+        future.add_done_callback(lambda done: self._process_done(job_id, done))
+        return job_id
+
+    def _process_pool(self):
+        with self._lock:
+            if self.processes is None:
+                # Forking a worker that has threads running can deadlock the child
+                self.processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_process,
+                    initargs=(process_config(self.app.config),)
+                )
+            return self.processes
+
+    def _process_done(self, job_id, future):
+        with self._lock:
+            self._outstanding -= 1
+        # The job writes its own status, unless its process died first
+        if future.cancelled():
+            self._write(job_id, status='failed', error='Cancelled')
+        elif future.exception() is not None:
+            self._write(job_id, status='failed', error=str(future.exception()) or 'The worker process stopped')
+        else:
+            # Stage timings from the pool show up on this worker's /metrics
+            self.app.extensions['metrics'].merge(future.result())
+
+    def status(self, job_id):
+        # Only hex ids are ever handed out, so anything else can't be a job
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def prune(self):
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    if now - entry.stat().st_mtime > self.ttl:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
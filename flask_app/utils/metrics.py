@@ -0,0 +1,226 @@
+import functools
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+
+import pandas as pd
+from flask import g, has_request_context, request, template_rendered, before_render_template
+
+# Upper bounds, Prometheus style; +Inf is implied
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROWS_BUCKETS = (10, 100, 1000, 10000, 50000, 100000, 500000, 1000000)
+BYTES_BUCKETS = tuple(2 ** power for power in range(16, 32, 2))
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self.lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def take(self):
+        with self.lock:
+            series, self.series = self.series, {}
+        return series
+
+    def merge(self, series):
+        with self.lock:
+            for label, (counts, total) in series.items():
+                current = self.series.get(label)
+                if current is None:
+                    self.series[label] = [list(counts), total]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+
+    def render(self, label_name):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((label, list(counts), total) for label, (counts, total) in self.series.items())
+        for label, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_name}="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{{label_name}="{label}"}} {cumulative}')
+        return lines
+
+
+def count_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], pd.DataFrame):
+        return len(value[0])
+    return None
+
+
+class Metrics:
+    # Wall time, rows and (optionally) peak traced memory for each pipeline
+    # stage, kept per process and served in the Prometheus text format.
+    # When METRICS_ENABLED is off a timed function costs one attribute check.
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.server_timing = False
+        self.track_memory = False
+        self.stage_seconds = Histogram('invoice_stage_seconds', 'Wall time per pipeline stage.', SECONDS_BUCKETS)
+        self.stage_rows = Histogram('invoice_stage_rows', 'Rows returned by each pipeline stage.', ROWS_BUCKETS)
+        self.stage_memory = Histogram('invoice_stage_peak_memory_bytes', 'Peak memory allocated by each pipeline stage.', BYTES_BUCKETS)
+        self.request_seconds = Histogram('invoice_request_seconds', 'Wall time per endpoint.', SECONDS_BUCKETS)
+        self.caches = {}
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['METRICS_ENABLED']
+        self.server_timing = app.config['METRICS_SERVER_TIMING']
+        # tracemalloc slows allocation heavy code down a lot, so it's opt in
+        self.track_memory = app.config['METRICS_TRACK_MEMORY']
+        app.extensions['metrics'] = self
+
+        if self.enabled:
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+            before_render_template.connect(self._start_render, app)
+            template_rendered.connect(self._finish_render, app)
+
+    def timed(self, fn=None, name=None):
+        if fn is None:
+            return functools.partial(self.timed, name=name)
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return fn(*args, **kwargs)
+            if self.track_memory:
+                self._start_memory()
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                if self.track_memory:
+                    peak = self._finish_memory()
+                    if peak is not None:
+                        self.stage_memory.observe(stage, peak)
+                self.observe(stage, elapsed)
+            rows = count_rows(result)
+            if rows is not None:
+                self.stage_rows.observe(stage, rows)
+            return result
+
+        return wrapper
+
+    def _start_memory(self):
+        # Stages nest, so each open stage keeps the memory in use when it
+        # started and the highest peak seen while it was open
+        stack = self._local.__dict__.setdefault('memory', [])
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._local.started_tracing = len(stack)
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+
+    def _finish_memory(self):
+        stack = self._local.memory
+        base, highest = stack.pop()
+        if not tracemalloc.is_tracing():
+            return None
+        highest = max(highest, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1][1] = max(stack[-1][1], highest)
+        if getattr(self._local, 'started_tracing', None) == len(stack):
+            tracemalloc.stop()
+            self._local.started_tracing = None
+        return highest - base
+
+    def observe(self, stage, seconds):
+        self.stage_seconds.observe(stage, seconds)
+        # Stages in background jobs have no request to report them on
+        if self.server_timing and has_request_context():
+            g.setdefault('server_timing', []).append((stage, seconds))
+
+    def _start_request(self):
+        g.request_start = time.perf_counter()
+
+    def _finish_request(self, response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        self.request_seconds.observe(request.endpoint or 'unknown', elapsed)
+
+        if self.server_timing:
+            timings = g.pop('server_timing', []) + [('total', elapsed)]
+            response.headers['Server-Timing'] = ', '.join(
+                f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings
+            )
+        return response
+
+    def _start_render(self, sender, template, context, **extra):
+        g.render_start = time.perf_counter()
+
+    def _finish_render(self, sender, template, context, **extra):
+        start = g.pop('render_start', None)
+        if start is not None:
+            self.observe(f"template.{template.name}", time.perf_counter() - start)
+
+    def take(self):
+        # Stage observations made since the last call. Upload processes hand
+        # them back with each job, they have no /metrics of their own.
+        return {histogram.name: histogram.take() for histogram in self.stages()}
+
+    def merge(self, observations):
+        for histogram in self.stages():
+            histogram.merge(observations.get(histogram.name, {}))
+
+    def add_cache(self, name, cache):
+        # Anything with a stats() of hits and misses, plus entries and bytes
+        # if it keeps track of them
+        self.caches[name] = cache
+
+    def stages(self):
+        return (self.stage_seconds, self.stage_rows, self.stage_memory)
+
+    def render(self):
+        lines = []
+        for histogram in self.stages():
+            lines.extend(histogram.render('stage'))
+        lines.extend(self.request_seconds.render('endpoint'))
+        lines.extend(self.render_caches())
+        return '\n'.join(lines) + '\n'
+
+    def render_caches(self):
+        lines = []
+        stats = sorted((name, cache.stats()) for name, cache in self.caches.items())
+        for stat, kind, help_text in (
+            ('hits', 'counter', 'Lookups answered from the cache.'),
+            ('misses', 'counter', 'Lookups the cache could not answer.'),
+            ('entries', 'gauge', 'Entries held in the cache.'),
+            ('bytes', 'gauge', 'Bytes held in the cache.')
+        ):
+            name = f"invoice_cache_{stat}_total" if kind == 'counter' else f"invoice_cache_{stat}"
+            values = [(cache, values[stat]) for cache, values in stats if stat in values]
+            if not values:
+                continue
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+            lines.extend(f'{name}{{cache="{cache}"}} {value}' for cache, value in values)
+        return lines
@@ -0,0 +1,42 @@
+import pandas as pd
+
+# Any run of digits with an optional decimal part, e.g. "posters $2 paint $3.50"
+MONEY_PATTERN = r'(\d+\.?\d*)'
+
+
+def parse_money(col):
+    # Form answers repeat a lot ("0", "50", "N/A"), so parse each distinct
+    # answer once and spread the sums back over the rows
+    codes, uniques = pd.factorize(col.astype(str))
+    numbers = pd.Series(uniques).str.extractall(MONEY_PATTERN)[0].astype('float64')
+    sums = numbers.groupby(level=0).sum().reindex(range(len(uniques)), fill_value=0.0)
+    return pd.Series(sums.to_numpy()[codes], index=col.index)
+
+
+def clean_name(col):
+    return col.astype('string').str.title().str.strip()
+
+
+def clean_text(col):
+    return col.astype('string').str.strip()
+
+
+# Each column is transformed exactly once, in this order
+COLUMN_SPECS = [
+    ('Instructor Provided Total', parse_money),
+    ('Side Projects', parse_money),
+    ('Invoices/Receipts', parse_money),
+    ('Full Name', clean_name),
+    ('Email Address', clean_text),
+]
+
+
+def normalize(df, specs=COLUMN_SPECS):
+    df = df.apply(lambda col: col.str.strip() if col.dtype == "string" else col)
+    df = df.fillna('0')
+
+    for column, transform in specs:
+        if column in df.columns:
+            df[column] = transform(df[column])
+
+    return df
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from flask_app.utils.dataset_index import DATE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'rates.json')
+
+# Flat pay per meeting attended
+WORK_MEETING_RATE = 20
+ADMIN_MEETING_RATE = 25
+
+# Lookups go by (instructor, day) packed into one int64 key. Days are
+# counted from 1970 and open ended periods run to the ends of the range.
+FIRST_DAY = -(1 << 20)
+LAST_DAY = 1 << 20
+DAY_SPAN = 1 << 21
+
+
+def to_day(value):
+    if value is None:
+        return None
+    return int(np.datetime64(value, 'D').astype('int64'))
+
+
+def to_days(dates):
+    # Rows without a date get the latest rate on file
+    days = pd.to_datetime(dates, errors='coerce').to_numpy(dtype='datetime64[D]')
+    missing = np.isnat(days)
+    days = days.astype('int64')
+    days[missing] = LAST_DAY - 1
+    return np.clip(days, FIRST_DAY, LAST_DAY - 1)
+
+
+class RateTable:
+    # The rate file compiled into arrays: every spelling of a name maps to
+    # one instructor, and each instructor has one or more rate periods.
+    # "from" is the first day a rate applies, "until" the first day it
+    # doesn't, and either may be left out.
+
+    def __init__(self, instructors, version):
+        self.version = version
+        spellings = {}
+        periods = []
+        for number, instructor in enumerate(instructors):
+            for name in [instructor['name']] + list(instructor.get('aliases', [])):
+                if spellings.setdefault(name, number) != number:
+                    raise ValueError(f"{name!r} is listed for more than one instructor")
+            for period in instructor['rates']:
+                start = to_day(period.get('from'))
+                end = to_day(period.get('until'))
+                periods.append((
+                    number,
+                    FIRST_DAY if start is None else start,
+                    LAST_DAY if end is None else end,
+                    float(period['rate']),
+                    np.nan if period.get('oh_rate') is None else float(period['oh_rate'])
+                ))
+
+        periods.sort()
+        for (number, _, end, _, _), (next_number, next_start, _, _, _) in zip(periods, periods[1:]):
+            if number == next_number and next_start < end:
+                raise ValueError(f"Overlapping rate periods for {instructors[number]['name']!r}")
+
+        self.names = pd.Index(sorted(spellings))
+        self.instructor_of = np.array([spellings[name] for name in self.names], dtype='int64')
+        columns = list(zip(*periods)) or [[]] * 5
+        self.period_instructor = np.array(columns[0], dtype='int64')
+        self.period_keys = self.period_instructor * DAY_SPAN + (np.array(columns[1], dtype='int64') - FIRST_DAY)
+        self.period_end = np.array(columns[2], dtype='int64')
+        self.rate_values = np.array(columns[3], dtype='float64')
+        self.oh_rate_values = np.array(columns[4], dtype='float64')
+        # Without any date ranges the rows' dates don't need parsing
+        self.dated = any(start != FIRST_DAY or end != LAST_DAY for _, start, end, _, _ in periods)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        # Formatting changes to the file don't change the version
+        canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+        version = hashlib.sha256(canonical.encode()).hexdigest()[:16]
+        return cls(data['instructors'], version)
+
+    def lookup(self, full_names, dates=None):
+        codes = self.names.get_indexer(full_names)
+        rate = np.full(len(codes), np.nan)
+        oh_rate = np.full(len(codes), np.nan)
+        known = np.flatnonzero(codes >= 0)
+        if dates is None or not self.dated:
+            days = np.full(len(known), LAST_DAY - 1)
+        else:
+            days = to_days(dates)[known]
+
+        # Last period starting on or before the day, if it hasn't ended yet
+        instructor = self.instructor_of[codes[known]]
+        position = np.searchsorted(self.period_keys, instructor * DAY_SPAN + (days - FIRST_DAY), side='right') - 1
+        clipped = np.maximum(position, 0)
+        covered = (
+            (position >= 0)
+            & (self.period_instructor[clipped] == instructor)
+            & (days < self.period_end[clipped])
+        )
+        rows = known[covered]
+        rate[rows] = self.rate_values[clipped[covered]]
+        oh_rate[rows] = self.oh_rate_values[clipped[covered]]
+
+        found = np.zeros(len(codes), dtype=bool)
+        found[rows] = True
+        return rate, oh_rate, found
+
+
+class RateBook:
+    # Each worker keeps the compiled rate table in memory. The file is looked
+    # at again at most every RATES_CHECK_INTERVAL seconds, and the table is
+    # only swapped when its version changes, so editing the file takes
+    # effect without a redeploy.
+
+    def __init__(self, app=None):
+        self.path = None
+        self.check_interval = 0
+        self._table = None
+        self._mtime = None
+        self._checked = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config['RATES_FILE']
+        self.check_interval = app.config['RATES_CHECK_INTERVAL']
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._table = RateTable.load(self.path)
+        self._checked = time.monotonic()
+        app.extensions['rate_book'] = self
+
+    def current(self):
+        if time.monotonic() - self._checked >= self.check_interval:
+            with self._lock:
+                self._reload()
+        return self._table
+
+    @property
+    def version(self):
+        return self.current().version
+
+    def _reload(self):
+        self._checked = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            logger.warning("Rate file %s is missing, keeping version %s", self.path, self._table.version)
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            table = RateTable.load(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Keep paying the old rates rather than failing every upload
+            logger.error("Could not load rate file %s, keeping version %s: %s", self.path, self._table.version, e)
+            return
+        self._mtime = mtime
+        if table.version != self._table.version:
+            logger.info("Rates changed from version %s to %s", self._table.version, table.version)
+            self._table = table
+
+
+def apply_rates(df, table):
+    if 'Full Name' not in df.columns:
+        return df
+
+    dates = None
+    if table.dated and 'Date' in df.columns:
+        dates = df['Date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, format=DATE_FORMAT, errors='coerce')
+    rate, oh_rate, found = table.lookup(df['Full Name'], dates)
+
+    # Names without a rate keep whatever was already in the column
+    for col, values in (('Rate', rate), ('OH Rate', oh_rate)):
+        if col in df.columns:
+            current = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64')
+        else:
+            current = np.full(len(df), np.nan)
+        df[col] = np.where(np.isnan(values), current, values)
+
+    unmatched = sorted(df.loc[~found, 'Full Name'].dropna().unique())
+    if unmatched:
+        logger.warning("No rate found for: %s", ", ".join(map(str, unmatched)))
+
+    return df
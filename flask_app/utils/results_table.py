@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from flask_app.utils.schema import SCHOOL_COLUMNS
+
+MAX_PAGE_SIZE = 1000
+
+# Column: (cell class, highlight above this value, highlight class)
+COLUMN_STYLES = {
+    'Rate': ('text-success rate', None, None),
+    'OH Rate': ('text-success rate', None, None),
+    'Calculated Total Amount': ('total', 1200, 'text-danger'),
+    'Instructor Provided Total': ('total', 1200, 'text-warning'),
+    'Work Meetings': ('meeting', 4, 'text-danger'),
+    'Admin Meetings': ('meeting', 0, 'text-danger'),
+    'Side Projects': ('total', 1200, 'text-warning'),
+    'Invoices/Receipts': ('total', 100, 'text-warning'),
+    'Total # of Classes': ('classes', 10, 'text-danger'),
+    **{school: ('count', 4, 'text-danger') for school in SCHOOL_COLUMNS}
+}
+
+
+def highlight_flags(df):
+    # One boolean column per highlighted column, True where it's over the limit
+    flags = {}
+    for col, (_, threshold, _) in COLUMN_STYLES.items():
+        if threshold is not None and col in df.columns:
+            flags[col] = pd.to_numeric(df[col], errors='coerce').to_numpy() > threshold
+    return pd.DataFrame(flags, index=df.index)
+
+
+def cell_classes(df):
+    flags = highlight_flags(df)
+    classes = {}
+    for col in df.columns:
+        css, _, alert = COLUMN_STYLES.get(col, ('', None, None))
+        if col in flags.columns:
+            classes[col] = np.where(flags[col], f"{alert} bold {css}", css)
+        else:
+            classes[col] = np.full(len(df), css, dtype=object)
+    return pd.DataFrame(classes, index=df.index, columns=df.columns)
+
+
+def slice_frame(df, offset=0, limit=100, sort=None, descending=False):
+    if sort in df.columns:
+        df = df.sort_values(sort, ascending=not descending, kind='stable')
+    offset = max(offset, 0)
+    limit = min(max(limit, 0), MAX_PAGE_SIZE)
+    return df.iloc[offset:offset + limit]
+
+
+def to_columns(df):
+    # Column oriented and JSON safe: missing values become null
+    data = {}
+    for col in df.columns:
+        values = df[col].astype(object)
+        data[col] = values.where(df[col].notna(), None).tolist()
+    return data
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from flask_app.utils.class_totals import paid_schools
+from flask_app.utils.compact import INVOICE_SCHEMA
+from flask_app.utils.dataset_index import DATE_FORMAT
+from flask_app.utils.rates import ADMIN_MEETING_RATE, WORK_MEETING_RATE
+from flask_app.utils.schema import SCHOOL_COLUMNS
+
+SUM_COLUMNS = [
+    'Work Meetings',
+    'Admin Meetings',
+    'Meeting Pay',
+    'Total # of Classes',
+    'Class Pay',
+    'Extra Pay',
+    'Calculated Total Amount'
+] + SCHOOL_COLUMNS
+
+SOURCE_COLUMNS = [
+    'Rate',
+    'OH Rate',
+    'Work Meetings',
+    'Admin Meetings',
+    'Total # of Classes',
+    'Side Projects',
+    'Invoices/Receipts',
+    'Calculated Total Amount'
+] + SCHOOL_COLUMNS
+
+
+# Class pay per school, kept with the instructor totals so the school
+# rollups are sums of what each instructor was paid there
+SCHOOL_PAY_COLUMNS = [f"{school} Pay" for school in SCHOOL_COLUMNS]
+
+
+def month_labels(dates):
+    # '2024-08' style labels, blank when the date couldn't be read
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=DATE_FORMAT, errors='coerce')
+    return dates.dt.strftime('%Y-%m').fillna('')
+
+
+class MonthlyRollups:
+    # Per month totals for each instructor, with a column of classes per
+    # school, and the same numbers rolled up per school. Built once when a
+    # dataset is stored and kept next to it on disk, so summaries never
+    # touch the submissions themselves.
+
+    def __init__(self, instructors):
+        self.instructors = instructors
+        self.schools = self.build_schools(instructors)
+
+    @classmethod
+    def build(cls, df, legacy_last_column=True):
+        # Takes a compact dataset, see compact.py
+        values = df.reindex(columns=SOURCE_COLUMNS, fill_value=0).astype('float64')
+        for col in INVOICE_SCHEMA.money:
+            if col in values.columns:
+                values[col] /= 100
+        text = df.reindex(columns=['Email Address', 'Full Name']).astype('string').fillna('')
+
+        # Each row's classes at its own rates, before anything is grouped,
+        # and only at the schools add_class_totals() counts
+        paid = paid_schools(legacy_last_column)
+        school_pay = pd.DataFrame(0.0, index=values.index, columns=SCHOOL_PAY_COLUMNS)
+        for school, pay_col in zip(SCHOOL_COLUMNS, SCHOOL_PAY_COLUMNS):
+            if school in paid:
+                # Orchard Hills classes are paid at the OH rate
+                rate = values['OH Rate'] if school == 'Orchard Hills' else values['Rate']
+                school_pay[pay_col] = values[school] * rate
+
+        # The same pay calculate_meetings() and calculate_classes() add to the total
+        frame = pd.DataFrame({
+            'Month': month_labels(df['Date']) if 'Date' in df.columns else '',
+            'Email Address': text['Email Address'].str.lower(),
+            'Full Name': text['Full Name'],
+            'Rate': values['Rate'],
+            'OH Rate': values['OH Rate'],
+            'Submissions': 1,
+            'Work Meetings': values['Work Meetings'],
+            'Admin Meetings': values['Admin Meetings'],
+            'Meeting Pay': values['Work Meetings'] * WORK_MEETING_RATE + values['Admin Meetings'] * ADMIN_MEETING_RATE,
+            'Total # of Classes': values['Total # of Classes'],
+            'Class Pay': school_pay.sum(axis=1),
+            'Extra Pay': values['Side Projects'] + values['Invoices/Receipts'],
+            'Calculated Total Amount': values['Calculated Total Amount']
+        })
+        frame[SCHOOL_COLUMNS] = values[SCHOOL_COLUMNS]
+        frame[SCHOOL_PAY_COLUMNS] = school_pay
+
+        aggregations = {col: 'sum' for col in ['Submissions'] + SUM_COLUMNS + SCHOOL_PAY_COLUMNS}
+        aggregations.update({'Full Name': 'last', 'Rate': 'max', 'OH Rate': 'max'})
+        instructors = (
+            frame.groupby(['Month', 'Email Address'], sort=True)
+            .agg(aggregations)
+            .reset_index()
+        )
+        return cls(instructors)
+
+    @staticmethod
+    def build_schools(instructors):
+        counts = instructors[SCHOOL_COLUMNS].to_numpy(dtype='float64')
+        pay = instructors[SCHOOL_PAY_COLUMNS].to_numpy(dtype='float64')
+
+        long = pd.DataFrame({
+            'Month': np.repeat(instructors['Month'].to_numpy(), len(SCHOOL_COLUMNS)),
+            'School': np.tile(SCHOOL_COLUMNS, len(instructors)),
+            'Classes': counts.ravel(),
+            'Instructors': (counts > 0).ravel().astype('int64'),
+            'Class Pay': pay.ravel()
+        })
+        schools = long.groupby(['Month', 'School'], sort=False).sum().reset_index()
+        # Months in order, schools in form order within each month
+        return schools.sort_values('Month', kind='stable').reset_index(drop=True)
+
+    def replace_months(self, df, months, legacy_last_column=True):
+        # Rebuild only the given months from a compact dataset, keeping the
+        # rest as they are. Used when new responses are appended.
+        codes = [int(year) * 100 + int(month) for year, month in (label.split('-') for label in months)]
+        dates = df['Date']
+        rows = (dates.dt.year * 100 + dates.dt.month).isin(codes).to_numpy()
+        changed = type(self).build(df[rows], legacy_last_column).instructors
+        kept = self.instructors[~self.instructors['Month'].isin(months)]
+        instructors = pd.concat([kept, changed], ignore_index=True)
+        return type(self)(instructors.sort_values(['Month', 'Email Address'], kind='stable').reset_index(drop=True))
+
+    def months(self):
+        return sorted(month for month in self.instructors['Month'].unique() if month)
+
+    def for_month(self, month=''):
+        # Pay per school is already in the school rollups
+        instructors = self.instructors.drop(columns=SCHOOL_PAY_COLUMNS)
+        if not month:
+            return instructors, self.schools
+        return (
+            instructors[instructors['Month'] == month].reset_index(drop=True),
+            self.schools[self.schools['Month'] == month].reset_index(drop=True)
+        )
+
+    def to_table(self):
+        return pa.Table.from_pandas(self.instructors, preserve_index=False)
+
+    @classmethod
+    def from_table(cls, table):
+        # Rollups stored without pay per school are built again
+        if not set(SCHOOL_PAY_COLUMNS) <= set(table.column_names):
+            return None
+        return cls(table.to_pandas())
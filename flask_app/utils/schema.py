@@ -0,0 +1,65 @@
+# Google Form question headers and the short names used everywhere else
+COLUMN_RENAMES = {
+    "Timestamp": "Date",
+    "How many work meetings did you attend?": "Work Meetings",
+    "How many administrative meetings did you attend?": "Admin Meetings",
+    "Total $$ for the month": "Instructor Provided Total",
+    "Did you work on any side projects?": "Side Projects",
+    "Any invoices/receipts?": "Invoices/Receipts",
+    "How many classes did you teach this month? [Arroyo]": "Arroyo",
+    "How many classes did you teach this month? [Myford]": "Myford",
+    "How many classes did you teach this month? [Tustin Ranch]": "Tustin Ranch",
+    "How many classes did you teach this month? [Ladera]": "Ladera",
+    "How many classes did you teach this month? [Anaheim Hills]": "Anaheim Hills",
+    "How many classes did you teach this month? [Historic Anaheim]": "Historic Anaheim",
+    "How many classes did you teach this month? [North Tustin]": "North Tustin",
+    "How many classes did you teach this month? [San Juan Capistrano]": "San Juan Capistrano",
+    "How many classes did you teach this month? [Hicks Canyon]": "Hicks Canyon",
+    "How many classes did you teach this month? [Orchard Hills]": "Orchard Hills",
+    "How many classes did you teach this month? [Peters Canyon]": "Peters Canyon",
+    "How many classes did you teach this month? [TMA]": "TMA"
+}
+
+SCHOOL_COLUMNS = [
+    'Arroyo',
+    'Myford',
+    'Tustin Ranch',
+    'Ladera',
+    'Anaheim Hills',
+    'Historic Anaheim',
+    'North Tustin',
+    'San Juan Capistrano',
+    'Hicks Canyon',
+    'Orchard Hills',
+    'Peters Canyon',
+    'TMA'
+]
+
+# Columns that only ever hold counts and can be read straight into numbers
+COUNT_COLUMNS = ['Work Meetings', 'Admin Meetings', 'Total # of Classes'] + SCHOOL_COLUMNS
+
+# Stored as plain numbers, shown as dollars in the table and the download
+CURRENCY_COLUMNS = [
+    'Rate',
+    'OH Rate',
+    'Calculated Total Amount',
+    'Instructor Provided Total',
+    'Side Projects',
+    'Invoices/Receipts'
+]
+
+# Every dataset has these columns in this order once it's been processed
+DATASET_COLUMNS = [
+    'Date',
+    'Email Address',
+    'Full Name',
+    'Rate',
+    'OH Rate',
+    'Calculated Total Amount',
+    'Instructor Provided Total',
+    'Work Meetings',
+    'Admin Meetings',
+    'Side Projects',
+    'Invoices/Receipts',
+    'Total # of Classes'
+] + SCHOOL_COLUMNS
@@ -0,0 +1,6 @@
+import os
+
+# Build the app once in the master and fork the workers from it, so they
+# start instantly and share its memory (see warm_up() in flask_app)
+preload_app = True
+os.environ.setdefault('APP_WARM_UP', 'true')
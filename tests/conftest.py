@@ -0,0 +1,69 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from flask_app import create_app
+
+# Everything the app writes goes under the test's own directory
+APP_DIRS = ['DATASET_DIR', 'UPLOAD_DIR', 'UPLOAD_SPOOL_DIR', 'JOBS_DIR', 'SHEET_CACHE_DIR', 'ARCHIVE_DIR']
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('SECRET_KEY', 'test')
+    monkeypatch.delenv('DB_HOST', raising=False)
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    for name in APP_DIRS:
+        monkeypatch.setenv(name, str(tmp_path / name.lower()))
+    return create_app()
+
+
+class SheetServer:
+    # A local stand-in for the Google Sheets export. It answers conditional
+    # requests the way Google does, and keeps the headers of every request.
+
+    def __init__(self):
+        self.body = b''
+        self.etag = '"1"'
+        self.last_modified = 'Mon, 01 Jan 2024 00:00:00 GMT'
+        self.status = 200
+        self.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}/export?format=xlsx"
+
+    def handler(self):
+        sheet = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                sheet.requests.append(dict(self.headers))
+                if sheet.status != 200:
+                    self.send_error(sheet.status)
+                    return
+                if self.headers.get('If-None-Match') == sheet.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                self.send_header('Content-Length', str(len(sheet.body)))
+                self.send_header('ETag', sheet.etag)
+                self.send_header('Last-Modified', sheet.last_modified)
+                self.end_headers()
+                self.wfile.write(sheet.body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def sheet_server():
+    sheet = SheetServer()
+    thread = threading.Thread(target=sheet.server.serve_forever, daemon=True)
+    thread.start()
+    yield sheet
+    sheet.server.shutdown()
+    sheet.server.server_close()
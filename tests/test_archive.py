@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+import pytest
+
+from flask_app.utils.archive import InvalidQuery, InvoiceArchive
+from flask_app.utils.compact import INVOICE_SCHEMA
+
+
+def invoices(rows):
+    return pd.DataFrame(rows, columns=['Date', 'Email Address', 'Full Name', 'Rate'])
+
+
+@pytest.fixture
+def archive(app):
+    return InvoiceArchive(app)
+
+
+def test_adding_the_same_responses_again_keeps_the_latest_copy(archive):
+    archive.add(invoices([
+        ['Mar 01 24 10:00:00 AM', 'ann@example.com', 'Ann Lee', 30],
+        ['Mar 02 24 10:00:00 AM', 'bo@example.com', 'Bo Park', 20]
+    ]))
+    archive.add(invoices([
+        ['Mar 01 24 10:00:00 AM', 'ann@example.com', 'Ann Lee', 35],
+        ['Mar 03 24 10:00:00 AM', 'ann@example.com', 'Ann Lee', 35]
+    ]))
+
+    df = INVOICE_SCHEMA.expand(archive.query())
+    assert df['Date'].tolist() == ['Mar 01 24 10:00:00 AM', 'Mar 02 24 10:00:00 AM', 'Mar 03 24 10:00:00 AM']
+    assert df['Rate'].tolist() == [35.0, 20.0, 35.0]
+    assert archive.months() == ['2024-03']
+
+
+def test_responses_without_a_date_are_not_archived(archive):
+    assert archive.add(invoices([['not a date', 'ann@example.com', 'Ann Lee', 30]])) == 0
+    assert archive.query().empty
+
+
+def test_query_only_reads_the_months_asked_for(archive):
+    archive.add(invoices([
+        ['Feb 10 24 10:00:00 AM', 'ann@example.com', 'Ann Lee', 30],
+        ['Mar 10 24 10:00:00 AM', 'ann@example.com', 'Ann Lee', 30],
+        ['Apr 10 24 10:00:00 AM', 'bo@example.com', 'Bo Park', 20]
+    ]))
+    assert archive.months() == ['2024-02', '2024-03', '2024-04']
+
+    # Months outside the range are never opened, a broken file there doesn't matter
+    with open(archive.partition_path(2024, 2), 'wb') as f:
+        f.write(b'not parquet')
+
+    df = archive.query(start='2024-03', end='2024-04', columns=['Date', 'Full Name'])
+    assert list(df.columns) == ['Date', 'Full Name']
+    assert df['Date'].dt.month.tolist() == [3, 4]
+    assert archive.query(start='2024-04')['Full Name'].tolist() == ['Bo Park']
+
+
+def test_query_filters_by_email_and_name(archive):
+    archive.add(invoices([
+        ['Mar 10 24 10:00:00 AM', 'ann@example.com', 'Ann Lee', 30],
+        ['Mar 11 24 10:00:00 AM', 'bo@example.com', 'Bo Park', 20]
+    ]))
+    assert archive.query(email='ANN@')['Full Name'].tolist() == ['Ann Lee']
+    assert archive.query(name='park')['Email Address'].tolist() == ['bo@example.com']
+
+
+def test_query_ignores_files_other_than_partitions(archive):
+    archive.add(invoices([['Mar 10 24 10:00:00 AM', 'ann@example.com', 'Ann Lee', 30]]))
+    partition = os.path.dirname(archive.partition_path(2024, 3))
+    for name in ('tmp1234.tmp', '.tmp5678.tmp'):
+        with open(os.path.join(partition, name), 'wb') as f:
+            f.write(b'half written')
+    assert len(archive.query()) == 1
+
+
+def test_query_rejects_unknown_columns_and_bad_months(archive):
+    with pytest.raises(InvalidQuery):
+        archive.query(columns=['Date', 'Nope'])
+    for month in ('2024-13', '2024', 'March'):
+        with pytest.raises(InvalidQuery):
+            archive.query(start=month)
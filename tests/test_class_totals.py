@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+import pytest
+
+from flask_app.controllers.general_controller import prepare_upload, read_excel
+from flask_app.utils.class_totals import add_class_totals
+from flask_app.utils.schema import SCHOOL_COLUMNS
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+# What the original app worked out for this workbook, a download that
+# already has Total # of Classes and Calculated Total Amount columns
+IAC_CLASSES = [2, 2, 2, 2, 2, 0, 2, 2, 2, 2, 2, 2, 2]
+IAC_TOTALS = [140, 120, 140, 150, 210, 100, 165, 505, 98, 100, 190, 160, 110]
+
+
+def test_legacy_totals_of_a_reuploaded_workbook_are_unchanged(app):
+    with app.app_context():
+        df = prepare_upload(read_excel(os.path.join(ROOT, 'IAC Invoice Form (Responses).xlsx')))
+    assert df['Total # of Classes'].tolist() == IAC_CLASSES
+    assert df['Calculated Total Amount'].tolist() == IAC_TOTALS
+
+
+def form(counts):
+    # Eleven columns before the schools, as insert_calculated_columns() leaves them
+    df = pd.DataFrame({f"Question {number}": ['x'] for number in range(10)})
+    df['Total # of Classes'] = [0]
+    for school, count in zip(SCHOOL_COLUMNS, counts):
+        df[school] = [count]
+    return df
+
+
+@pytest.mark.parametrize('legacy, expected', [(True, 11), (False, 12)])
+def test_last_school_is_only_counted_without_legacy_totals(legacy, expected):
+    df = add_class_totals(form([1] * len(SCHOOL_COLUMNS)), legacy_last_column=legacy)
+    assert df['Total # of Classes'].tolist() == [expected]
+
+
+def test_corrected_totals_go_by_school_name():
+    df = form([1] * len(SCHOOL_COLUMNS))
+    df['Notes'] = ['7']
+    df = add_class_totals(df[['Notes'] + list(df.columns[:-1])], legacy_last_column=False)
+    assert df['Total # of Classes'].tolist() == [len(SCHOOL_COLUMNS)]
@@ -0,0 +1,39 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from flask_app.utils.dataset_store import DatasetStore
+
+
+@pytest.fixture
+def store(app):
+    return DatasetStore(app)
+
+
+def test_every_write_gets_a_new_version(store):
+    key = store.new_key()
+    versions = set()
+    for rate in range(40):
+        store.put(key, pd.DataFrame({'Rate': [rate]}), metadata={'rate_version': str(rate)})
+        versions.add(store.version(key))
+    assert len(versions) == 40
+
+
+def test_version_follows_linked_files_and_missing_keys(store):
+    key = store.put(store.new_key(), pd.DataFrame({'Rate': [1]}))
+    linked = store.link(store.new_key(), store.path(key))
+    assert store.version(linked) != store.version(key)
+    assert store.version(linked).split('-', 1)[1] == store.version(key).split('-', 1)[1]
+    assert store.version(store.new_key()) is None
+    assert store.version(None) is None
+
+
+def test_files_without_a_revision_are_versioned_by_content(store):
+    key = store.new_key()
+    table = pa.Table.from_pandas(pd.DataFrame({'Rate': [1]}), preserve_index=False)
+    store._write_table(store.path(key), table)
+    first = store.version(key)
+    assert first == store.version(key)
+
+    store._write_table(store.path(key), pa.Table.from_pandas(pd.DataFrame({'Rate': [2]}), preserve_index=False))
+    assert store.version(key) != first
@@ -0,0 +1,58 @@
+import os
+import urllib.error
+
+import pytest
+
+from flask_app.utils.fetcher import SheetFetcher
+
+
+@pytest.fixture
+def fetcher(app):
+    return SheetFetcher(app)
+
+
+def test_first_fetch_downloads_without_validators(fetcher, sheet_server):
+    sheet_server.body = b'first version'
+    assert fetcher.fetch(sheet_server.url) == b'first version'
+    assert 'If-None-Match' not in sheet_server.requests[0]
+    assert 'If-Modified-Since' not in sheet_server.requests[0]
+
+
+def test_unchanged_sheet_is_served_from_disk(fetcher, sheet_server):
+    sheet_server.body = b'first version'
+    fetcher.fetch(sheet_server.url)
+
+    # A 304 has no body, so the copy on disk is what comes back
+    sheet_server.body = b''
+    assert fetcher.fetch(sheet_server.url) == b'first version'
+    assert sheet_server.requests[1]['If-None-Match'] == '"1"'
+    assert sheet_server.requests[1]['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+def test_changed_sheet_is_downloaded_again(fetcher, sheet_server):
+    sheet_server.body = b'first version'
+    fetcher.fetch(sheet_server.url)
+
+    sheet_server.body = b'second version'
+    sheet_server.etag = '"2"'
+    assert fetcher.fetch(sheet_server.url) == b'second version'
+
+    # and the new validators are the ones sent next time
+    assert fetcher.fetch(sheet_server.url) == b'second version'
+    assert sheet_server.requests[2]['If-None-Match'] == '"2"'
+
+
+def test_validators_are_not_sent_without_a_copy_on_disk(fetcher, sheet_server):
+    sheet_server.body = b'first version'
+    fetcher.fetch(sheet_server.url)
+    _, body_path = fetcher._paths(sheet_server.url)
+    os.unlink(body_path)
+
+    assert fetcher.fetch(sheet_server.url) == b'first version'
+    assert 'If-None-Match' not in sheet_server.requests[1]
+
+
+def test_server_errors_are_raised(fetcher, sheet_server):
+    sheet_server.status = 500
+    with pytest.raises(urllib.error.HTTPError):
+        fetcher.fetch(sheet_server.url)
@@ -0,0 +1,88 @@
+import os
+import time
+from io import BytesIO
+
+import pytest
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'example_for_upload.xlsx')
+
+
+@pytest.fixture
+def client(app, sheet_server):
+    with open(WORKBOOK, 'rb') as f:
+        sheet_server.body = f.read()
+    app.config['GOOGLE_SHEET_URL'] = sheet_server.url
+    return app.test_client()
+
+
+def start_import(client, full=False):
+    # The form posts an empty file field when no workbook is picked
+    data = {'file': (BytesIO(b''), '')}
+    if full:
+        data['full_import'] = '1'
+    response = client.post('/', data=data, content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert response.location.startswith('/import/')
+    return response.location.rsplit('/', 1)[1]
+
+
+def wait_for(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} didn't finish")
+
+
+def test_sheet_import_runs_in_the_background_and_redirects_to_results(client, sheet_server):
+    job_id = start_import(client)
+    assert wait_for(client, job_id) == {'id': job_id, 'status': 'done', 'error': None}
+
+    response = client.get(f'/import/{job_id}')
+    assert response.status_code == 302
+    assert response.location == '/results'
+    results = client.get('/results')
+    assert results.status_code == 200
+    assert b'<tr' in results.data
+
+
+def test_import_page_shows_progress_until_the_job_is_done(client, app):
+    job_id = app.extensions['job_queue'].submit(time.sleep, 0.5)
+    with client.session_transaction() as session:
+        session['import_job'] = job_id
+        session['import_source'] = 'sheet'
+
+    response = client.get(f'/import/{job_id}')
+    assert response.status_code == 200
+    assert job_id.encode() in response.data
+    wait_for(client, job_id)
+    assert client.get(f'/import/{job_id}').location == '/results'
+
+
+def test_reimporting_an_unchanged_sheet_is_answered_with_304(client, sheet_server):
+    wait_for(client, start_import(client))
+    wait_for(client, start_import(client, full=True))
+
+    assert len(sheet_server.requests) == 2
+    assert sheet_server.requests[1]['If-None-Match'] == sheet_server.etag
+
+
+def test_failed_import_is_shown_on_the_upload_page(client, sheet_server, caplog):
+    sheet_server.status = 500
+    job_id = start_import(client)
+    job = wait_for(client, job_id)
+    assert job['status'] == 'failed'
+    assert '500' in job['error']
+    assert f"Job {job_id} failed" in caplog.text
+
+    response = client.get(f'/import/{job_id}')
+    assert response.status_code == 200
+    assert b'Error processing sheet' in response.data
+
+
+def test_unknown_jobs(client):
+    assert client.get('/jobs/0123abcd').status_code == 404
+    assert client.get('/jobs/not-a-job').status_code == 404
+    assert client.get('/import/0123abcd').location == '/'
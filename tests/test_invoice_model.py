@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from flask_app import create_app, get_db
+from flask_app.models.invoice import Invoice, UnsupportedDialect
+
+
+@pytest.fixture
+def db_app(app, tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'invoices.db'}")
+    app = create_app()
+    with app.app_context():
+        get_db().create_all()
+        yield app
+
+
+def invoices(rates):
+    return pd.DataFrame({
+        'Date': ['Mar 01 24 10:00:00 AM', 'Mar 02 24 10:00:00 AM'],
+        'Email Address': ['ann@example.com', 'bo@example.com'],
+        'Full Name': ['Ann Lee', 'Bo Park'],
+        'Rate': rates,
+        'Total # of Classes': [4, 2]
+    })
+
+
+def test_upsert_frame_is_idempotent(db_app):
+    assert Invoice.upsert_frame(invoices([30.0, 20.0]), batch_size=1) == 2
+    assert Invoice.upsert_frame(invoices([30.0, 20.0]), batch_size=1) == 2
+    assert get_db().session.query(Invoice).count() == 2
+
+    # Saving a response again updates the row it saved before
+    Invoice.upsert_frame(invoices([35.0, 20.0]))
+    df = Invoice.load_month(2024, 3)
+    assert len(df) == 2
+    assert df['Rate'].tolist() == [35.0, 20.0]
+    assert df['Total # of Classes'].tolist() == [4, 2]
+
+
+def test_upsert_statement_rejects_other_databases(db_app):
+    with pytest.raises(UnsupportedDialect, match='mssql'):
+        Invoice.upsert_statement('mssql', [], [])
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from flask_app.utils.normalize import parse_money
+
+
+def test_parse_money_sums_every_amount_in_an_answer():
+    col = pd.Series(['50', '$12.50 + $7.50', '3 receipts: 10, 20.25', '1.'])
+    assert parse_money(col).tolist() == [50.0, 20.0, 33.25, 1.0]
+
+
+def test_parse_money_treats_answers_without_numbers_as_zero():
+    col = pd.Series(['N/A', '', 'none', '0'])
+    assert parse_money(col).tolist() == [0.0, 0.0, 0.0, 0.0]
+
+
+def test_parse_money_handles_numbers_and_repeated_answers():
+    col = pd.Series([5, 5.5, '5', 5], index=[10, 11, 12, 13])
+    result = parse_money(col)
+    assert result.index.tolist() == [10, 11, 12, 13]
+    assert result.tolist() == [5.0, 5.5, 5.0, 5.0]
+    assert result.dtype == 'float64'
+
+
+def test_parse_money_empty_column():
+    assert parse_money(pd.Series([], dtype=object)).empty
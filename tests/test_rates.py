@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flask_app.utils.rates import RateTable
+
+INSTRUCTORS = [
+    {
+        'name': 'Ann Lee',
+        'aliases': ['Ann'],
+        'rates': [
+            {'rate': 30, 'until': '2024-03-01'},
+            {'rate': 35, 'oh_rate': 10, 'from': '2024-03-01'}
+        ]
+    },
+    {
+        'name': 'Bo Park',
+        'rates': [{'rate': 20, 'from': '2024-01-10', 'until': '2024-02-01'}]
+    },
+    {
+        'name': 'Cy Diaz',
+        'rates': [{'rate': 25}]
+    }
+]
+
+
+@pytest.fixture
+def table():
+    return RateTable(INSTRUCTORS, 'test')
+
+
+def lookup(table, names, dates):
+    return table.lookup(pd.Series(names), pd.Series(pd.to_datetime(dates, format='ISO8601')))
+
+
+def test_period_starts_on_from_and_ends_before_until(table):
+    rate, oh_rate, found = lookup(
+        table,
+        ['Ann Lee', 'Ann Lee', 'Bo Park', 'Bo Park', 'Bo Park', 'Bo Park'],
+        ['2024-02-29', '2024-03-01', '2024-01-09', '2024-01-10', '2024-01-31 23:59', '2024-02-01']
+    )
+    assert found.tolist() == [True, True, False, True, True, False]
+    np.testing.assert_array_equal(rate, [30, 35, np.nan, 20, 20, np.nan])
+    np.testing.assert_array_equal(oh_rate, [np.nan, 10, np.nan, np.nan, np.nan, np.nan])
+
+
+def test_open_ended_periods_cover_any_date(table):
+    rate, _, found = lookup(table, ['Ann Lee', 'Cy Diaz', 'Cy Diaz'], ['1990-01-01', '1990-01-01', '2099-12-31'])
+    assert found.all()
+    assert rate.tolist() == [30, 25, 25]
+
+
+def test_rows_without_a_date_get_the_latest_rate(table):
+    rate, _, found = lookup(table, ['Ann Lee', 'Bo Park'], [None, None])
+    assert found.tolist() == [True, False]
+    assert rate[0] == 35
+
+
+def test_no_dates_uses_the_latest_rate(table):
+    rate, _, found = table.lookup(pd.Series(['Ann', 'Cy Diaz', 'Nobody']))
+    assert found.tolist() == [True, True, False]
+    np.testing.assert_array_equal(rate, [35, 25, np.nan])
+
+
+def test_undated_table_ignores_dates():
+    table = RateTable([INSTRUCTORS[2]], 'test')
+    assert not table.dated
+    rate, _, found = lookup(table, ['Cy Diaz'], ['2024-01-01'])
+    assert found.tolist() == [True]
+    assert rate.tolist() == [25]
+
+
+def test_overlapping_periods_are_rejected():
+    instructors = [{'name': 'Ann Lee', 'rates': [{'rate': 30, 'until': '2024-03-02'}, {'rate': 35, 'from': '2024-03-01'}]}]
+    with pytest.raises(ValueError, match='Overlapping'):
+        RateTable(instructors, 'test')
+
+
+def test_alias_of_two_instructors_is_rejected():
+    instructors = [{'name': 'Ann Lee', 'rates': [{'rate': 30}]}, {'name': 'Ann', 'aliases': ['Ann Lee'], 'rates': [{'rate': 35}]}]
+    with pytest.raises(ValueError, match='more than one instructor'):
+        RateTable(instructors, 'test')
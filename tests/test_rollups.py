@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from flask_app.controllers.general_controller import prepare_upload, read_excel
+from flask_app.utils.compact import INVOICE_SCHEMA
+from flask_app.utils.rollups import SCHOOL_PAY_COLUMNS, MonthlyRollups
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+
+def invoices(rows):
+    # Date, rate, OH rate and classes at Arroyo, Orchard Hills and TMA
+    df = pd.DataFrame([
+        {'Date': date, 'Email Address': 'ann@example.com', 'Full Name': 'Ann Lee', 'Rate': rate, 'OH Rate': oh_rate,
+         'Arroyo': arroyo, 'Orchard Hills': orchard_hills, 'TMA': tma}
+        for date, rate, oh_rate, arroyo, orchard_hills, tma in rows
+    ])
+    return INVOICE_SCHEMA.compact(df)
+
+
+def school_pay(rollups, school):
+    _, schools = rollups.for_month('2024-03')
+    return schools.loc[schools['School'] == school, 'Class Pay'].item()
+
+
+def test_each_row_is_paid_at_its_own_rates():
+    rollups = MonthlyRollups.build(invoices([
+        ['Mar 01 24 10:00:00 AM', 30, 40, 2, 1, 0],
+        ['Mar 20 24 10:00:00 AM', 35, 45, 1, 2, 0]
+    ]))
+    assert school_pay(rollups, 'Arroyo') == 2 * 30 + 1 * 35
+    assert school_pay(rollups, 'Orchard Hills') == 1 * 40 + 2 * 45
+    instructors, _ = rollups.for_month('2024-03')
+    assert instructors['Class Pay'].item() == 95 + 130
+    assert not set(SCHOOL_PAY_COLUMNS) & set(instructors.columns)
+
+
+@pytest.mark.parametrize('legacy, tma_pay', [(True, 0), (False, 60)])
+def test_last_school_is_paid_like_the_class_totals(legacy, tma_pay):
+    rollups = MonthlyRollups.build(invoices([['Mar 01 24 10:00:00 AM', 30, 40, 1, 0, 2]]), legacy_last_column=legacy)
+    assert school_pay(rollups, 'TMA') == tma_pay
+    instructors, _ = rollups.for_month('2024-03')
+    assert instructors['Class Pay'].item() == 30 + tma_pay
+
+
+def test_school_rollups_add_up_to_the_instructor_rollups(app):
+    with app.app_context():
+        df = INVOICE_SCHEMA.compact(prepare_upload(read_excel(os.path.join(ROOT, 'example_for_upload.xlsx'))))
+    instructors, schools = MonthlyRollups.build(df).for_month()
+
+    by_instructor = instructors.groupby('Month')['Class Pay'].sum()
+    by_school = schools.groupby('Month')['Class Pay'].sum()
+    pd.testing.assert_series_equal(by_instructor, by_school)
+    assert by_school['2024-01'] == 10920
+
+
+def test_replaced_months_keep_pay_per_school():
+    df = invoices([['Feb 01 24 10:00:00 AM', 30, 40, 1, 0, 0], ['Mar 01 24 10:00:00 AM', 30, 40, 1, 0, 0]])
+    rollups = MonthlyRollups.build(df.iloc[:1])
+    rollups = rollups.replace_months(df, {'2024-03'})
+    assert rollups.months() == ['2024-02', '2024-03']
+    assert school_pay(rollups, 'Arroyo') == 30
+
+
+def test_rollups_stored_without_pay_per_school_are_rebuilt():
+    rollups = MonthlyRollups.build(invoices([['Mar 01 24 10:00:00 AM', 30, 40, 1, 0, 0]]))
+    old = pa.Table.from_pandas(rollups.instructors.drop(columns=SCHOOL_PAY_COLUMNS), preserve_index=False)
+    assert MonthlyRollups.from_table(old) is None
+    assert MonthlyRollups.from_table(rollups.to_table()).months() == ['2024-03']